@@ -1,18 +1,142 @@
-from sqlalchemy.orm import Session
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import Select, and_, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
 
+# Rows per transaction for bulk inserts; keeps the IN (...) lookup below
+# SQLite's bound-parameter limit.
+BULK_CHUNK_SIZE = 500
+
 
-def create_claim(db: Session, claim: schemas.ClaimCreate):
+async def create_claim(db: AsyncSession, claim: schemas.ClaimCreate):
     db_claim = models.Claim(**claim.model_dump())
     db.add(db_claim)
-    db.commit()
-    db.refresh(db_claim)
+    await db.commit()
+    await db.refresh(db_claim)
     return db_claim
 
 
-def get_claim(db: Session, claim_id: int):
-    return db.query(models.Claim).filter(models.Claim.id == claim_id).first()
+async def create_claims_bulk(db: AsyncSession, claims: list[schemas.ClaimCreate],
+                             chunk_size: int = BULK_CHUNK_SIZE) -> list[schemas.BulkClaimResult]:
+    """Inserts claims in chunked executemany transactions.
+
+    Policy number conflicts (against the table or earlier rows of the same
+    batch) are reported per item instead of aborting the batch.
+    """
+    results: list[schemas.BulkClaimResult] = []
+    seen_policy_numbers: set[str] = set()
+
+    for start in range(0, len(claims), chunk_size):
+        chunk = claims[start:start + chunk_size]
+        existing = set(await db.scalars(
+            select(models.Claim.policy_number).where(
+                models.Claim.policy_number.in_([c.policy_number for c in chunk]))))
+
+        pending: list[tuple[dict, schemas.BulkClaimResult]] = []
+        for offset, claim in enumerate(chunk):
+            result = schemas.BulkClaimResult(index=start + offset)
+            results.append(result)
+            if claim.policy_number in existing or claim.policy_number in seen_policy_numbers:
+                result.error = f"policy_number {claim.policy_number} already exists"
+                continue
+            seen_policy_numbers.add(claim.policy_number)
+            row = claim.model_dump()
+            row["id"] = models.generate_claim_id()
+            result.id = row["id"]
+            pending.append((row, result))
+
+        if not pending:
+            continue
+        try:
+            await db.execute(insert(models.Claim), [row for row, _ in pending])
+            await db.commit()
+        except IntegrityError:
+            # A concurrent writer (or an id collision) got in between the
+            # lookup and the insert; retry this chunk row by row.
+            await db.rollback()
+            for row, result in pending:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(models.Claim), [row])
+                except IntegrityError as e:
+                    result.id = None
+                    result.error = f"Integrity error: {e.orig}"
+            await db.commit()
+
+    return results
+
+
+async def get_claim(db: AsyncSession, claim_id: int):
+    result = await db.scalars(select(models.Claim).where(models.Claim.id == claim_id))
+    return result.first()
+
+
+# --- Keyset pagination ---
+# Cursors are opaque url-safe tokens holding the sort key of the last row
+# returned, so each page is an index range scan instead of an OFFSET skip.
+
+def encode_cursor(claim: models.Claim, order_by: str) -> str:
+    if order_by == "incident_date":
+        key = [claim.incident_date.isoformat() if claim.incident_date else None, claim.id]
+    else:
+        key = [claim.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, order_by: str) -> list:
+    """Decodes a cursor, raising ValueError if it is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        expected_length = 2 if order_by == "incident_date" else 1
+        if not isinstance(key, list) or len(key) != expected_length or not isinstance(key[-1], str):
+            raise ValueError("Invalid cursor")
+        if order_by == "incident_date" and key[0] is not None:
+            key[0] = datetime.fromisoformat(key[0])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    return key
+
+
+def _ordered_claims(order_by: str, cursor: Optional[str]) -> Select:
+    query = select(models.Claim)
+    if order_by == "incident_date":
+        if cursor:
+            last_date, last_id = decode_cursor(cursor, order_by)
+            # SQLite sorts NULL dates first; comparisons with NULL never match
+            if last_date is None:
+                query = query.where(or_(
+                    and_(models.Claim.incident_date.is_(None), models.Claim.id > last_id),
+                    models.Claim.incident_date.is_not(None)))
+            else:
+                query = query.where(or_(
+                    models.Claim.incident_date > last_date,
+                    and_(models.Claim.incident_date == last_date, models.Claim.id > last_id)))
+        return query.order_by(models.Claim.incident_date, models.Claim.id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, order_by)
+        query = query.where(models.Claim.id > last_id)
+    return query.order_by(models.Claim.id)
+
+
+async def get_claims_page(db: AsyncSession, limit: int, cursor: Optional[str] = None,
+                          order_by: str = "id") -> tuple[list[models.Claim], Optional[str]]:
+    """Returns up to `limit` claims after `cursor` and the cursor of the next page."""
+    # Fetch one extra row to know whether another page exists
+    claims = list(await db.scalars(_ordered_claims(order_by, cursor).limit(limit + 1)))
+    if len(claims) <= limit:
+        return claims, None
+    claims = claims[:limit]
+    return claims, encode_cursor(claims[-1], order_by)
 
 
-def get_all_claims(db: Session):
-    return db.query(models.Claim).all()
+async def iter_claims(db: AsyncSession, order_by: str = "id", cursor: Optional[str] = None,
+                      batch_size: int = 1000) -> AsyncIterator[models.Claim]:
+    """Streams claims from a server-side cursor, holding one batch in memory at a time."""
+    query = _ordered_claims(order_by, cursor).execution_options(yield_per=batch_size)
+    async for claim in await db.stream_scalars(query):
+        yield claim
@@ -1,18 +1,60 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./claims.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={
-                       "check_same_thread": False})
+SQLALCHEMY_DATABASE_URL = os.getenv("CLAIMS_DATABASE_URL", "sqlite+aiosqlite:///./claims.db")
+
+# PRAGMAs applied to every new connection, by storage profile
+STORAGE_PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit. journal_mode
+    # persists in the database file, so it is set back explicitly.
+    "default": {"journal_mode": "DELETE"},
+    # WAL lets readers (db_utils) run alongside the writer; synchronous=NORMAL
+    # fsyncs at checkpoints instead of on every commit, so a power loss can
+    # drop the last commits but never corrupts the database.
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+    # WAL concurrency with an fsync on every commit
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+STORAGE_PROFILE = os.getenv("CLAIMS_DB_PROFILE", "wal")
+if STORAGE_PROFILE not in STORAGE_PROFILES:
+    raise ValueError(f"Unknown CLAIMS_DB_PROFILE {STORAGE_PROFILE!r}; expected one of {sorted(STORAGE_PROFILES)}")
+
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
+
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@event.listens_for(engine.sync_engine, "connect")
+def apply_storage_profile(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in STORAGE_PROFILES[STORAGE_PROFILE].items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+# expire_on_commit=False: attributes of committed objects stay loaded, since
+# lazy loads cannot run implicitly under asyncio
+SessionLocal = async_sessionmaker(
+    bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,11 +1,49 @@
-from fastapi import FastAPI, HTTPException
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app import models, schemas, crud, database
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import http_clients
+import metrics
+from app import models, schemas, crud, database, write_queue
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
-app = FastAPI()
-database.Base.metadata.create_all(bind=database.engine)
+MAX_BULK_CLAIMS = 10000
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_PROMPTS = 10000
+MAX_BATCH_CONCURRENCY = 32
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# Set in lifespan when CLAIMS_WRITE_BEHIND=1
+write_behind: Optional[write_queue.WriteBehindQueue] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global write_behind
+    await database.init_db()
+    load_dotenv()  # OPENAI_API_KEY for POST /chat/batch may come from .env
+    # The chat pipeline posts created claims to this app in-process, not over the network
+    http_clients.registry.transports.setdefault(http_clients.CLAIMS_API_URL, httpx.ASGITransport(app=app))
+    if write_queue.WRITE_BEHIND_ENABLED:
+        write_behind = write_queue.WriteBehindQueue()
+        write_behind.start()
+    yield
+    if write_behind is not None:
+        await write_behind.stop()
+        write_behind = None
+    await database.engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,19 +54,110 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # The route template (/claims/{claim_id}), so labels stay bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    method = request.method if request.method in HTTP_METHODS else "OTHER"
+    if path != "/metrics":
+        # For streamed responses this is the time to the first byte
+        metrics.registry.observe(f"api {method} {path}",
+                                 1000 * (time.perf_counter() - started), status=response.status_code)
+    return response
+
+
 @app.post("/claims/", response_model=schemas.Claim)
-def create_claim(claim: schemas.ClaimCreate, db: Session = Depends(database.get_db)):
-    return crud.create_claim(db=db, claim=claim)
+async def create_claim(claim: schemas.ClaimCreate, db: AsyncSession = Depends(database.get_db)):
+    if write_behind is not None:
+        try:
+            claim_id = await write_behind.submit(claim)
+        except write_queue.WriteConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return schemas.Claim(id=claim_id, **claim.model_dump())
+    try:
+        return await crud.create_claim(db=db, claim=claim)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409, detail=f"policy_number {claim.policy_number} already exists")
+
+
+@app.post("/claims/bulk", response_model=schemas.BulkClaimResponse)
+async def create_claims_bulk(claims: list[schemas.ClaimCreate], db: AsyncSession = Depends(database.get_db)):
+    if len(claims) > MAX_BULK_CLAIMS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BULK_CLAIMS} claims per request")
+    results = await crud.create_claims_bulk(db, claims)
+    created = sum(1 for result in results if result.id is not None)
+    return schemas.BulkClaimResponse(
+        created=created, failed=len(results) - created, results=results)
 
 
 @app.get("/claims/{claim_id}", response_model=schemas.Claim)
-def read_claim(claim_id: str, db: Session = Depends(database.get_db)):
-    db_claim = crud.get_claim(db, claim_id=claim_id)
+async def read_claim(claim_id: str, db: AsyncSession = Depends(database.get_db)):
+    db_claim = await crud.get_claim(db, claim_id=claim_id)
     if db_claim is None:
         raise HTTPException(status_code=404, detail="Claim not found")
     return db_claim
 
 
-@app.get("/claims/", response_model=list[schemas.Claim])
-def list_claims(db: Session = Depends(database.get_db)):
-    return crud.get_all_claims(db)
+async def stream_claims_ndjson(order_by: str, cursor: Optional[str]):
+    # The request-scoped session may be closed before the body is streamed,
+    # so the stream owns its session.
+    async with database.SessionLocal() as db:
+        async for claim in crud.iter_claims(db, order_by=order_by, cursor=cursor):
+            yield schemas.Claim.model_validate(claim).model_dump_json() + "\n"
+
+
+@app.get("/claims/", response_model=schemas.ClaimPage)
+async def list_claims(limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                      cursor: Optional[str] = None,
+                      order_by: Literal["id", "incident_date"] = "id",
+                      output_format: Literal["json", "ndjson"] = Query("json", alias="format"),
+                      db: AsyncSession = Depends(database.get_db)):
+    if cursor:
+        try:
+            crud.decode_cursor(cursor, order_by)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if output_format == "ndjson":
+        # Streams every claim after the cursor; limit does not apply
+        return StreamingResponse(stream_claims_ndjson(order_by, cursor),
+                                 media_type="application/x-ndjson")
+    claims, next_cursor = await crud.get_claims_page(db, limit, cursor=cursor, order_by=order_by)
+    return schemas.ClaimPage(items=claims, next_cursor=next_cursor)
+
+
+@app.post("/chat/batch")
+async def chat_batch(batch: schemas.ChatBatchRequest):
+    """Runs each prompt through the chat pipeline, streaming one NDJSON record
+    per prompt (in completion order, with its `index`) as it finishes."""
+    if len(batch.prompts) > MAX_BATCH_PROMPTS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BATCH_PROMPTS} prompts per request")
+    if batch.concurrency is not None and not 1 <= batch.concurrency <= MAX_BATCH_CONCURRENCY:
+        raise HTTPException(
+            status_code=422, detail=f"concurrency must be between 1 and {MAX_BATCH_CONCURRENCY}")
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=503, detail="Chat pipeline unavailable: OPENAI_API_KEY is not set")
+    # Imported on first use: the pipeline needs the LLM settings, the rest of the API does not
+    import batch_chat
+
+    async def stream_records():
+        async for record in batch_chat.run_batch(
+                batch.prompts, batch.concurrency or batch_chat.BATCH_CONCURRENCY, batch.include_rows):
+            yield json.dumps(record, default=str) + "\n"
+
+    return StreamingResponse(stream_records(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text format: API request stages, plus chatbot turn stages and
+    token counts read from the CLAIMS_METRICS_JSONL sink when it is set."""
+    metrics.registry.ingest_jsonl()
+    return PlainTextResponse(metrics.registry.render_prometheus(),
+                             media_type="text/plain; version=0.0.4")
@@ -1,12 +1,26 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, event, func
+from sqlalchemy.schema import CreateIndex
+from claims_fts import CLAIMS_FTS_EXISTS, CLAIMS_FTS_REBUILD, CLAIMS_FTS_STATEMENTS
 from .database import Base
 import uuid
 
 
+def generate_claim_id() -> str:
+    return f"CLM-{str(uuid.uuid4().int)[:10]}"
+
+
 class Claim(Base):
     __tablename__ = "claims"
+    # Keep in sync with CLAIM_INDEXES in db_utils.py
+    __table_args__ = (
+        Index("ix_claims_status", "status"),
+        Index("ix_claims_company_status", "company", "status"),
+        Index("ix_claims_adjuster_name", "adjuster_name"),
+        Index("ix_claims_policy_holder_name", "policy_holder_name"),
+        Index("ix_claims_incident_date_id", "incident_date", "id"),
+    )
 
-    id = Column(String, primary_key=True, index=True, default=lambda: f"CLM-{str(uuid.uuid4().int)[:10]}")
+    id = Column(String, primary_key=True, index=True, default=generate_claim_id)
     policy_holder_name = Column(String)
     policy_number = Column(String, unique=True)
     vehicle_make = Column(String)
@@ -19,3 +33,26 @@ class Claim(Base):
     company = Column(String)
     claim_office = Column(String)
     point_of_impact = Column(String)
+
+
+# Expression index for WHERE date(incident_date) = ... filters
+Index("ix_claims_incident_day", func.date(Claim.incident_date))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_missing_indexes(target, connection, **kw):
+    # create_all skips the indexes of tables that already exist, so indexes
+    # added after a database was first created are created here. IF NOT
+    # EXISTS rather than checkfirst, which cannot see expression indexes.
+    for index in Claim.__table__.indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_claims_fts(target, connection, **kw):
+    fts_exists = connection.exec_driver_sql(CLAIMS_FTS_EXISTS).first()
+    for statement in CLAIMS_FTS_STATEMENTS:
+        connection.exec_driver_sql(statement)
+    if not fts_exists:
+        # Index the claims written before claims_fts existed
+        connection.exec_driver_sql(CLAIMS_FTS_REBUILD)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 
 class ClaimBase(BaseModel):
@@ -26,3 +27,26 @@ class Claim(ClaimBase):
 
     class Config:
         from_attributes = True
+
+
+class BulkClaimResult(BaseModel):
+    index: int  # Position of the payload in the submitted batch
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkClaimResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkClaimResult]
+
+
+class ClaimPage(BaseModel):
+    items: list[Claim]
+    next_cursor: Optional[str] = None  # None when this is the last page
+
+
+class ChatBatchRequest(BaseModel):
+    prompts: list[str]
+    concurrency: Optional[int] = None  # Turns in flight; defaults to CLAIMS_BATCH_CONCURRENCY
+    include_rows: bool = True  # Include the first page of rows of retrieve turns
@@ -0,0 +1,105 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+from . import crud, database, schemas
+
+# Group POST /claims/ inserts into shared transactions (off by default)
+WRITE_BEHIND_ENABLED = os.getenv("CLAIMS_WRITE_BEHIND", "0") == "1"
+# A group commits once it has MAX_ROWS claims or its first claim has waited MAX_DELAY_MS
+WRITE_BATCH_MAX_ROWS = int(os.getenv("CLAIMS_WRITE_BATCH_ROWS", "200"))
+WRITE_BATCH_MAX_DELAY_MS = float(os.getenv("CLAIMS_WRITE_BATCH_MS", "5"))
+
+
+class WriteConflict(Exception):
+    """The claim was rejected, e.g. for a duplicate policy_number."""
+
+
+@dataclass
+class _PendingWrite:
+    claim: schemas.ClaimCreate
+    future: "asyncio.Future[str]" = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class WriteBehindQueue:
+    """Batches single-claim inserts into group commits.
+
+    Each submit() resolves only after the transaction holding its claim has
+    committed, so an acknowledged claim is as durable as with a direct
+    insert; the fsync (and SQLite's single-writer lock) is paid once per
+    group instead of once per request.
+    """
+
+    def __init__(self, max_rows: int = WRITE_BATCH_MAX_ROWS,
+                 max_delay_ms: float = WRITE_BATCH_MAX_DELAY_MS):
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self._queue: "asyncio.Queue[_PendingWrite]" = asyncio.Queue()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.groups = 0
+        self.rows = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Commits what is already queued, then stops the writer."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def submit(self, claim: schemas.ClaimCreate) -> str:
+        """Queues a claim and returns its id once its group has committed."""
+        pending = _PendingWrite(claim)
+        self._queue.put_nowait(pending)
+        return await pending.future
+
+    async def _collect(self) -> list[_PendingWrite]:
+        group = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(group) < self.max_rows:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                group.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return group
+
+    async def _run(self):
+        while True:
+            group = await self._collect()
+            try:
+                async with database.SessionLocal() as db:
+                    results = await crud.create_claims_bulk(
+                        db, [pending.claim for pending in group], chunk_size=len(group))
+                for pending, result in zip(group, results):
+                    if pending.future.done():  # The request was cancelled
+                        continue
+                    if result.id is None:
+                        pending.future.set_exception(WriteConflict(result.error))
+                    else:
+                        pending.future.set_result(result.id)
+                self.groups += 1
+                self.rows += len(group)
+            except Exception as e:
+                for pending in group:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+            finally:
+                for _ in group:
+                    self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "groups": self.groups,
+            "rows": self.rows,
+            "avg_group_size": self.rows / self.groups if self.groups else 0.0,
+            "queued": self._queue.qsize(),
+        }
@@ -0,0 +1,140 @@
+# batch_chat.py
+"""Runs many chat prompts through pipeline.run_turn and reports one NDJSON record each.
+
+    python batch_chat.py prompts.txt -o results.ndjson --concurrency 16
+    python batch_chat.py prompts.txt --in-process   # No running API needed
+
+The same runner backs the API's POST /chat/batch.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, TextIO
+
+from db_utils import run_page_async
+from pipeline import NullStatus, run_turn
+
+# Turns in flight at once
+BATCH_CONCURRENCY = int(os.getenv("CLAIMS_BATCH_CONCURRENCY", "8"))
+
+
+def _rows(data: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    return [dict(zip(data.keys(), values)) for values in zip(*data.values())]
+
+
+async def run_prompt(index: int, prompt: str, include_rows: bool = True) -> Dict[str, Any]:
+    """Runs one turn and condenses its message into a batch record."""
+    try:
+        message = await run_turn(prompt, NullStatus())
+    except Exception as e:  # run_turn reports its own failures; this is a last resort
+        return {"index": index, "prompt": prompt, "error": f"An unexpected error occurred: {e}"}
+
+    record: Dict[str, Any] = {
+        "index": index,
+        "prompt": prompt,
+        "intent": message.get("intent"),
+        "content": message.get("content"),
+    }
+    if message.get("payload"):
+        record["payload"] = message["payload"]
+    if message.get("response"):
+        record["claim_id"] = message["response"].get("id")
+    result_query = message.get("result_query")
+    if result_query:
+        record["sql"] = result_query["sql"]
+        record["params"] = result_query["params"]
+        record["row_count"] = message.get("result_count")
+        if include_rows:
+            # The first page, which the turn has just fetched into the result cache
+            page = await run_page_async(result_query["sql"], tuple(result_query["params"]), columnar=True)
+            if page.error or page.explain_error:
+                record["rows_error"] = page.error or page.explain_error
+            else:
+                record["rows"] = _rows(page.data or {})
+    if message.get("error"):
+        record["error"] = message["error"]
+    record["timings"] = message.get("timings")
+    return record
+
+
+async def run_batch(prompts: Iterable[str], concurrency: int = BATCH_CONCURRENCY,
+                    include_rows: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """Yields a record per prompt, in completion order, with at most `concurrency` turns running.
+
+    Prompts are pulled lazily, so a large file is never held as tasks at once;
+    records carry the prompt's `index` in the input.
+    """
+    records: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=2 * concurrency)
+    numbered = enumerate(prompts)
+
+    async def worker():
+        for index, prompt in numbered:
+            await records.put(await run_prompt(index, prompt, include_rows))
+
+    async def drain():
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            await records.put(None)
+
+    runner = asyncio.create_task(drain())
+    try:
+        while (record := await records.get()) is not None:
+            yield record
+        await runner  # Re-raises a failure of the prompt source
+    finally:
+        # The consumer stopped early (e.g. the HTTP client disconnected)
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+
+
+def read_prompts(f: TextIO) -> Iterable[str]:
+    """One prompt per line; blank lines are skipped."""
+    for line in f:
+        if line.strip():
+            yield line.strip()
+
+
+async def main(args: argparse.Namespace):
+    total = errors = 0
+    started = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        if args.in_process:
+            import httpx
+
+            import http_clients
+            import pipeline
+            from app.main import app
+
+            http_clients.registry.transports[pipeline.API_BASE_URL] = httpx.ASGITransport(app=app)
+            await stack.enter_async_context(app.router.lifespan_context(app))
+        source = sys.stdin if args.prompts == "-" else stack.enter_context(open(args.prompts, encoding="utf-8"))
+        output = stack.enter_context(open(args.output, "w", encoding="utf-8")) if args.output else sys.stdout
+        async for record in run_batch(read_prompts(source), args.concurrency, not args.no_rows):
+            output.write(json.dumps(record, default=str) + "\n")
+            output.flush()
+            total += 1
+            errors += "error" in record
+    elapsed = time.perf_counter() - started
+    print(f"{total} prompts in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f}/s), {errors} errors",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("prompts", help="Text file with one prompt per line, or - for stdin")
+    parser.add_argument("-o", "--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--no-rows", action="store_true", help="Omit retrieved rows; keep the SQL and count")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Serve the API in this process instead of calling the running one")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    import http_clients
+    http_clients.run(main(args))
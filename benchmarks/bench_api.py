@@ -0,0 +1,95 @@
+# benchmarks/bench_api.py
+"""Concurrent load against a running claims API.
+
+Start the API (`uvicorn app.main:app --workers 1`) and run, e.g.:
+
+    python benchmarks/bench_api.py --mode mixed --concurrency 64 --requests 5000
+
+Run it against two checkouts to compare requests/second and latency
+percentiles before and after a change.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthesizer import batch_to_records, synthesize_claims  # noqa: E402
+
+MODES = ("create", "get", "list", "mixed")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def seed_ids(client: httpx.AsyncClient, count: int) -> List[str]:
+    response = await client.get("/claims/", params={"limit": count})
+    response.raise_for_status()
+    return [claim["id"] for claim in response.json()["items"]]
+
+
+async def main(args: argparse.Namespace):
+    # A fresh seed per run keeps creates from mostly reusing earlier runs' policy numbers;
+    # the few that collide are rejected by the API and counted as errors
+    payloads = [record for batch in synthesize_claims(args.requests, seed=int(time.time()))
+                for record in batch_to_records(batch)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        ids = await seed_ids(client, 500) if args.mode in ("get", "mixed") else []
+        if args.mode == "get" and not ids:
+            sys.exit("No claims to read; run --mode create first.")
+
+        latencies: List[float] = []
+        errors = 0
+        next_request = iter(range(args.requests))
+
+        async def send(i: int) -> httpx.Response:
+            mode = args.mode if args.mode != "mixed" else random.choice(("create", "get", "list"))
+            if mode == "create" or (mode == "get" and not ids):
+                return await client.post("/claims/", json=payloads[i])
+            if mode == "get":
+                return await client.get(f"/claims/{random.choice(ids)}")
+            return await client.get("/claims/", params={"limit": args.page_size})
+
+        async def worker():
+            nonlocal errors
+            for i in next_request:
+                started = time.perf_counter()
+                try:
+                    response = await send(i)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"mode={args.mode} concurrency={args.concurrency} requests={args.requests} errors={errors}")
+    print(f"throughput: {args.requests / elapsed:.1f} req/s over {elapsed:.2f}s")
+    print("latency ms: mean {:.1f}  p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+        1000 * statistics.fmean(latencies), 1000 * percentile(latencies, 50),
+        1000 * percentile(latencies, 95), 1000 * percentile(latencies, 99), 1000 * latencies[-1]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=os.getenv("CLAIMS_API_URL", "http://localhost:8000"))
+    parser.add_argument("--mode", choices=MODES, default="mixed")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
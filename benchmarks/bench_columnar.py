@@ -0,0 +1,78 @@
+# benchmarks/bench_columnar.py
+"""Time and peak memory of row-dict versus columnar fetches of a large result.
+
+    python benchmarks/bench_columnar.py --rows 100000
+
+Builds a throwaway database with `--rows` claims and fetches all of them
+with run_query in both modes, then (if pandas is installed) turns each
+result into the DataFrame the chatbot renders.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["CLAIMS_RESULT_CACHE"] = "0"  # Measure SQLite fetches, not cache hits
+TIMEOUT = 600  # tracemalloc slows the fetch well past the default statement timeout
+
+
+def populate(database: str, rows: int):
+    rng = random.Random(0)
+    start = datetime(2023, 1, 1)
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        "INSERT INTO claims VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((f"CLM-{i:010d}", f"Holder {rng.randrange(5000)}", f"POL-{i:07d}", "Toyota", "Camry",
+          rng.randrange(2005, 2025), (start + timedelta(minutes=rng.randrange(10 ** 6))).isoformat(" "),
+          "Rear-ended at a stop light", f"Adjuster {rng.randrange(50)}",
+          rng.choice(["Open", "Approved", "Closed"]), "Acme Insurance", "Chicago", "Rear")
+         for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def measure(label: str, fn):
+    """Times fn untraced, then runs it again under tracemalloc for its peak memory."""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    value = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {1000 * elapsed:>9.0f} ms  peak {peak / 2 ** 20:>8.1f} MiB")
+    return value
+
+
+def main(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # db_utils opens ./claims.db
+        import db_utils
+        db_utils.initialize_database()
+        populate(db_utils.DATABASE_FILE, args.rows)
+        query = "SELECT * FROM claims"
+
+        rows = measure("rows (list of dicts)", lambda: db_utils.run_query(query, max_rows=None, timeout=TIMEOUT).rows)
+        columnar = measure("columnar", lambda: db_utils.run_query(query, max_rows=None, timeout=TIMEOUT, columnar=True))
+        try:
+            import pandas as pd
+        except ImportError:
+            print("pandas not installed; skipping DataFrame construction")
+        else:
+            measure("rows -> DataFrame", lambda: pd.DataFrame(rows))
+            measure("columnar -> DataFrame", lambda: pd.DataFrame(columnar.data, columns=columnar.columns))
+        db_utils.read_pool.close()
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    main(parser.parse_args())
@@ -0,0 +1,145 @@
+# benchmarks/bench_gateway.py
+"""LLM call success rate and latency with and without llm_gateway, against a stub provider.
+
+The stub accepts at most --provider-concurrency calls at a time and
+answers the rest with a 429, like a rate-limited OpenAI deployment. Each
+session sends one prompt; --duplicates of them repeat an earlier prompt,
+as when many users ask the same thing. No API key or network is needed:
+
+    python benchmarks/bench_gateway.py --sessions 200 --provider-concurrency 8 --duplicates 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class StubRateLimitError(Exception):
+    """Shaped like pydantic-ai's ModelHTTPError for a 429."""
+    status_code = 429
+
+
+@dataclass
+class StubUsage:
+    total_tokens: int
+
+
+@dataclass
+class StubResult:
+    data: str
+    tokens: int
+
+    def usage(self) -> StubUsage:
+        return StubUsage(self.tokens)
+
+
+class StubProvider:
+    """Answers after a jittered delay; rejects calls over its concurrency with a 429."""
+
+    def __init__(self, max_concurrency: int, latency_ms: float):
+        self.max_concurrency = max_concurrency
+        self.latency = latency_ms / 1000
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self.rejected = 0
+
+    async def complete(self, prompt: str) -> StubResult:
+        self.calls += 1
+        if self.in_flight >= self.max_concurrency:
+            self.rejected += 1
+            await asyncio.sleep(0.005)
+            raise StubRateLimitError("429 Too Many Requests")
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency * random.uniform(0.75, 1.25))
+        finally:
+            self.in_flight -= 1
+        return StubResult(json.dumps({"action": "create", "query_details": None}), 200 + len(prompt) // 4)
+
+
+class StubAgent:
+    """The part of a pydantic-ai Agent the gateway calls."""
+
+    def __init__(self, provider: StubProvider):
+        self.provider = provider
+
+    async def run(self, prompt: str) -> StubResult:
+        return await self.provider.complete(prompt)
+
+
+def make_prompts(sessions: int, duplicates: float) -> List[str]:
+    prompts: List[str] = []
+    for i in range(sessions):
+        if prompts and random.random() < duplicates:
+            prompts.append(random.choice(prompts))
+        else:
+            prompts.append(f"I got rear-ended at a red light, case {i}")
+    return prompts
+
+
+async def run_sessions(mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    import llm_gateway
+
+    provider = StubProvider(args.provider_concurrency, args.latency_ms)
+    agent = StubAgent(provider)
+    llm_gateway.COALESCE_ENABLED = mode == "gateway+coalesce"
+    gateway = llm_gateway.LLMGateway(args.rpm, args.tpm, args.max_concurrency)
+    prompts = make_prompts(args.sessions, args.duplicates)
+    latencies: List[float] = []
+    failures = 0
+
+    async def session(prompt: str):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            if mode == "direct":
+                await agent.run(prompt)
+            else:
+                await gateway.run(agent, prompt, "intent_agent")
+            latencies.append(time.perf_counter() - started)
+        except StubRateLimitError:
+            failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(prompt) for prompt in prompts))
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "latencies": sorted(latencies), "failures": failures,
+            "provider": provider, "stats": gateway.stats() if mode != "direct" else {}}
+
+
+def main(args: argparse.Namespace):
+    from metrics import percentile
+
+    print(f"{'mode':<18} {'ok':>5} {'failed':>6} {'calls':>6} {'429s':>5} {'peak':>5} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'coalesced':>9} {'limit':>6} {'secs':>6}")
+    for mode in ("direct", "gateway", "gateway+coalesce"):
+        random.seed(args.seed)
+        r = asyncio.run(run_sessions(mode, args))
+        provider, stats = r["provider"], r["stats"]
+        print(f"{mode:<18} {len(r['latencies']):>5} {r['failures']:>6} {provider.calls:>6} "
+              f"{provider.rejected:>5} {provider.peak:>5} "
+              f"{1000 * percentile(r['latencies'], 0.5):>8.0f} {1000 * percentile(r['latencies'], 0.95):>8.0f} "
+              f"{stats.get('coalesced', '-'):>9} {stats.get('concurrency_limit', '-'):>6} {r['elapsed']:>6.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200, help="Concurrent sessions, one prompt each")
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Share of prompts repeating an earlier one")
+    parser.add_argument("--provider-concurrency", type=int, default=8, help="Calls the stub accepts at once")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Gateway's starting concurrency limit")
+    parser.add_argument("--rpm", type=int, default=0, help="Gateway requests per minute (0: unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="Gateway tokens per minute (0: unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
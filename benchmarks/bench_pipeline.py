@@ -0,0 +1,182 @@
+# benchmarks/bench_pipeline.py
+"""Offline throughput and latency of full chat turns (pipeline.run_turn).
+
+The three agents run on pydantic-ai FunctionModels that answer with canned
+JSON after a configurable delay, and the FastAPI app is served in-process
+through httpx.ASGITransport, so no API key, network or running server is
+needed. Everything writes to a throwaway working directory.
+
+    python benchmarks/bench_pipeline.py --concurrency 1 4 16 --turns 200 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Create prompts and retrieve prompts; several retrieves need sql_agent
+# (names, dates) and the rest go through the direct lookup or the caches.
+DEFAULT_CORPUS = [
+    "I got rear-ended at a red light in my 2019 Honda Civic yesterday",
+    "Someone backed into my Toyota Camry in a parking lot, please file a claim",
+    "Need to file a claim, a deer hit the front of my Ford F-150 last night",
+    "My car was sideswiped on the highway, driver side damage",
+    "Hail damaged the roof of my Subaru Outback, policy POL-123456",
+    "Show me all approved claims",
+    "Find claims with status Pending",
+    "List claims for Acme Insurance",
+    "Show claims handled by adjuster Maria Lopez",
+    "Find claims filed after 2024-01-01 for Honda vehicles",
+    "What's the status of claim CLM-0000000001?",
+    "Show me all claims with rear impact from last year",
+]
+
+RETRIEVE_WORDS = ("show", "find", "list", "what's", "status of")
+
+
+def _user_prompt(messages) -> str:
+    for part in messages[-1].parts:
+        if getattr(part, "part_kind", None) == "user-prompt":
+            return part.content if isinstance(part.content, str) else str(part.content)
+    return ""
+
+
+def fake_intent(prompt: str) -> Dict[str, Any]:
+    if any(word in prompt.lower() for word in RETRIEVE_WORDS):
+        return {"action": "retrieve", "query_details": prompt}
+    return {"action": "create", "query_details": None}
+
+
+def fake_extraction(prompt: str) -> Dict[str, Any]:
+    return {"incident_description": prompt}
+
+
+def fake_sql(prompt: str) -> Dict[str, Any]:
+    words = [w.strip(",.?'") for w in prompt.split()]
+    capitalized = [w for w in words[1:] if w[:1].isupper()]
+    if capitalized:
+        condition = " OR ".join(
+            f"policy_holder_name LIKE '%{w}%' OR adjuster_name LIKE '%{w}%' OR vehicle_make = '{w}'"
+            for w in capitalized)
+        return {"sql": f"SELECT * FROM claims WHERE {condition} ORDER BY incident_date DESC;",
+                "explanation": "Stand-in query."}
+    return {"sql": "SELECT * FROM claims ORDER BY incident_date DESC LIMIT 50;",
+            "explanation": "Stand-in query."}
+
+
+def stand_in_model(answer, latency_ms: float, jitter: float):
+    """A FunctionModel that replies with answer(prompt) as JSON text after a delay."""
+    from pydantic_ai.messages import ModelResponse, TextPart
+    from pydantic_ai.models.function import FunctionModel
+
+    def delay() -> float:
+        return max(0.0, latency_ms * random.uniform(1 - jitter, 1 + jitter)) / 1000
+
+    async def respond(messages, info):
+        await asyncio.sleep(delay())
+        return ModelResponse(parts=[TextPart(json.dumps(answer(_user_prompt(messages))))])
+
+    async def respond_stream(messages, info):
+        text = json.dumps(answer(_user_prompt(messages)))
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        for chunk in chunks:
+            await asyncio.sleep(delay() / len(chunks))
+            yield chunk
+
+    return FunctionModel(respond, stream_function=respond_stream)
+
+
+def summarize(values: List[float]) -> str:
+    from metrics import percentile
+    values = sorted(values)
+    return "p50 {:>7.1f}  p95 {:>7.1f}  p99 {:>7.1f}".format(
+        percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99))
+
+
+async def run_level(corpus: List[str], turns: int, concurrency: int) -> Dict[str, Any]:
+    from pipeline import NullStatus, run_turn
+
+    semaphore = asyncio.Semaphore(concurrency)
+    prompts = [corpus[i % len(corpus)] for i in range(turns)]
+
+    async def one(prompt: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_turn(prompt, NullStatus())
+
+    started = time.perf_counter()
+    messages = await asyncio.gather(*(one(prompt) for prompt in prompts))
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "messages": messages}
+
+
+def report(concurrency: int, level: Dict[str, Any]):
+    messages = level["messages"]
+    stages: Dict[str, List[float]] = {}
+    for message in messages:
+        for stage, ms in message["timings"].get("stages", {}).items():
+            stages.setdefault(stage, []).append(ms)
+    errors = sum(1 for message in messages if message.get("error"))
+    print(f"\n== concurrency {concurrency}: {len(messages)} turns in {level['elapsed']:.2f}s, "
+          f"{len(messages) / level['elapsed']:.1f} turns/s, {errors} errors")
+    print(f"{'end-to-end':<22} {summarize([m['timings']['total_ms'] for m in messages])}")
+    print(f"{'first output':<22} {summarize([m['timings']['first_output_ms'] for m in messages])}")
+    for stage, values in sorted(stages.items()):
+        print(f"{stage:<22} {summarize(values)}  (n={len(values)})")
+
+
+async def main(args: argparse.Namespace):
+    import httpx
+
+    import http_clients
+    import pipeline
+    from app.main import app
+    from extraction_agent import get_extraction_agent
+    from intent_agent import get_intent_agent
+    from sql_agent import get_sql_agent
+
+    pipeline.STREAMING_ENABLED = args.stream
+    corpus = DEFAULT_CORPUS
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+
+    http_clients.registry.transports[pipeline.API_BASE_URL] = httpx.ASGITransport(app=app)
+    with ExitStack() as overrides:
+        for agent, answer in ((get_intent_agent(), fake_intent), (get_extraction_agent(), fake_extraction),
+                              (get_sql_agent(), fake_sql)):
+            overrides.enter_context(agent.override(
+                model=stand_in_model(answer, args.llm_latency_ms, args.jitter)))
+        async with app.router.lifespan_context(app):
+            try:
+                for concurrency in args.concurrency:
+                    report(concurrency, await run_level(corpus, args.turns, concurrency))
+            finally:
+                await http_clients.registry.aclose_loop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--turns", type=int, default=100, help="Turns per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter", type=float, default=0.25, help="Relative latency jitter")
+    parser.add_argument("--stream", action="store_true", help="Stream agent output like the UI")
+    parser.add_argument("--corpus", help="Text file with one prompt per line")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    workdir = tempfile.mkdtemp(prefix="claims-bench-")
+    os.chdir(workdir)  # claims.db, sql_cache.db and intent_log.jsonl go here
+    os.environ["CLAIMS_DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/claims.db"
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")  # Agents are never called
+    print(f"working directory: {workdir}")
+    asyncio.run(main(args))
@@ -0,0 +1,92 @@
+# benchmarks/bench_startup.py
+"""Chatbot cold-start cost: module import times and time to first render.
+
+Every measurement runs in a fresh interpreter, so nothing is cached from a
+previous one:
+
+    python benchmarks/bench_startup.py --repeat 5
+
+"first render" runs chatbot.py once headless with Streamlit's AppTest;
+"warm_up" is the agent and resource construction the chatbot now defers
+to a background thread after the first render.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What the chatbot imports up front, then what it defers, then third-party libraries
+IMPORTS = [
+    "db_utils", "metrics", "intent_classifier", "sql_cache", "index_advisor", "synthesizer",
+    "pipeline", "turn_worker",
+    "pydantic_ai", "logfire", "faker", "numpy", "httpx",
+]
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print(1000 * (time.perf_counter() - started))
+"""
+
+WARM_UP_SNIPPET = """
+import time
+import pipeline
+started = time.perf_counter()
+pipeline.warm_up()
+print(1000 * (time.perf_counter() - started))
+"""
+
+FIRST_RENDER_SNIPPET = """
+import time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+app = AppTest.from_file({script!r}, default_timeout=120).run()
+elapsed = 1000 * (time.perf_counter() - started)
+if app.exception:
+    raise SystemExit(str(app.exception))
+print(elapsed)
+"""
+
+
+def run_snippet(code: str, workdir: str) -> float:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.setdefault("OPENAI_API_KEY", "startup-benchmark")  # Agents are built, never called
+    output = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def median_ms(code: str, repeat: int, workdir: str) -> str:
+    try:
+        return f"{statistics.median(run_snippet(code, workdir) for _ in range(repeat)):>9.1f} ms"
+    except subprocess.CalledProcessError as e:
+        return f"{'failed':>12}  ({(e.stderr or '').strip().splitlines()[-1:]})"
+
+
+def main(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as workdir:  # Keeps claims.db and caches out of the repo
+        results = {}
+        for module in IMPORTS:
+            results[f"import {module}"] = median_ms(IMPORT_SNIPPET.format(module=module), args.repeat, workdir)
+        results["pipeline.warm_up()"] = median_ms(WARM_UP_SNIPPET, args.repeat, workdir)
+        script = os.path.join(ROOT, "chatbot.py")
+        results["first render (AppTest)"] = median_ms(
+            FIRST_RENDER_SNIPPET.format(script=script), args.repeat, workdir)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for label, value in results.items():
+        print(f"{label:<26} {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+# benchmarks/bench_writes.py
+"""Concurrent POST /claims/ throughput and latency per storage configuration.
+
+Each configuration (storage profile x write-behind on/off) runs in a fresh
+subprocess against a throwaway database, with the app served in-process
+through httpx.ASGITransport:
+
+    python benchmarks/bench_writes.py --concurrency 64 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONFIGURATIONS = [
+    ("default", "0"),
+    ("durable", "0"),
+    ("wal", "0"),
+    ("durable", "1"),
+    ("wal", "1"),
+]
+
+
+async def run_one(concurrency: int, requests: int) -> Dict[str, float]:
+    import httpx
+
+    from app.main import app
+    from benchmarks.bench_api import percentile
+    from synthesizer import batch_to_records, synthesize_claims
+
+    payloads = [record for batch in synthesize_claims(requests, seed=0)
+                for record in batch_to_records(batch)]
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    next_request = iter(payloads)
+
+    async with app.router.lifespan_context(app):
+        # Unhandled errors (e.g. "database is locked") are counted as 500s
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                for payload in next_request:
+                    started = time.perf_counter()
+                    response = await client.post("/claims/", json=payload)
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "req_per_s": requests / elapsed,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+        "created": statuses.get(200, 0),
+        "conflicts": statuses.get(409, 0),
+        "errors": sum(count for status, count in statuses.items() if status >= 500),
+    }
+
+
+def main(args: argparse.Namespace):
+    print(f"{'profile':<8} {'write-behind':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'created':>8} {'409s':>6} {'5xx':>6}")
+    for profile, write_behind in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       CLAIMS_DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/claims.db",
+                       CLAIMS_DB_PROFILE=profile,
+                       CLAIMS_WRITE_BEHIND=write_behind)
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker",
+                 "--concurrency", str(args.concurrency), "--requests", str(args.requests)],
+                env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{profile:<8} {'on' if write_behind == '1' else 'off':<12} {r['req_per_s']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['created']:>8} {r['conflicts']:>6} {r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(asyncio.run(run_one(args.concurrency, args.requests))))
+    else:
+        main(args)
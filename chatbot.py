@@ -1,28 +1,26 @@
 # chatbot.py
 import streamlit as st
-import httpx
-import asyncio
-from datetime import datetime
-import json
-import traceback
-from typing import List, Dict, Any, Optional
+import math
+import time
+from typing import TYPE_CHECKING, Dict, Any, Optional
 
 # Import necessary components
-from models import (
-    Claim, ClaimCreate, PartialClaim, HTTPValidationError,
-    Intent, SQLQuery, InvalidSQLRequest, SQLResponse
-)
-from extraction_agent import extraction_agent
-from synthesizer import synthesize_claim
-from db_utils import execute_sql, explain_sql
-from intent_agent import intent_agent
-from sql_agent import sql_agent
-from pydantic import ValidationError as PydanticValidationError, TypeAdapter
+from db_utils import RESULT_PAGE_SIZE, QueryResult, initialize_database, read_pool, result_cache, run_page
+from index_advisor import advise, format_report
+from intent_classifier import get_intent_classifier
+from llm_gateway import gateway
+from sql_cache import sql_query_cache
+import metrics
+import speculation
+
+if TYPE_CHECKING:
+    from turn_worker import TurnWorker
 
 # --- Configuration ---
-API_BASE_URL = "http://127.0.0.1:8000"  # Your running API URL
+STATUS_POLL_SECONDS = 0.1  # How often the UI replays a running turn's progress
 
 # --- Streamlit App ---
+initialize_database()  # Creates the claims table and managed indexes if missing
 
 st.set_page_config(page_title="Test Claim Generator Bot", layout="wide")
 st.title("🤖 Test Claim + Retrieval Bot")
@@ -36,28 +34,70 @@ if "messages" not in st.session_state:
             "content": "Hello! How can I help you create or find a test claim today?"}
     ]
 
+with st.sidebar:
+    with st.expander("🗂️ Index Advisor", expanded=False):
+        st.text(format_report(advise()))
+    with st.expander("⏱️ Turn Latency", expanded=False):
+        st.json(metrics.registry.snapshot())
+    with st.expander("🚦 LLM Gateway", expanded=False):
+        st.json(gateway.stats())
+    with st.expander("🔌 DB Connection Pool", expanded=False):
+        st.json(read_pool.stats())
+    with st.expander("🧮 Query Result Cache", expanded=False):
+        st.json(result_cache.stats())
+    with st.expander("⚡ SQL Translation Cache", expanded=False):
+        st.json(sql_query_cache.stats())
+    with st.expander("🎯 Intent Fast Path", expanded=False):
+        st.json(get_intent_classifier().stats())
+    if speculation.SPECULATION_ENABLED:
+        with st.expander("🏎️ Speculative Pipeline", expanded=False):
+            st.json(speculation.speculation_stats.stats())
+
 # --- Helper Functions ---
 
 
-def display_results_as_table(results: List[Dict[str, Any]]):
-    """Displays SQLite results in a Streamlit table/dataframe."""
-    if not results:
+def display_results_as_table(result: QueryResult):
+    """Displays a columnar query result in a Streamlit table/dataframe."""
+    if not result.row_count:
         st.info("No matching claims found in the database.")
         return
     try:
         import pandas as pd
-        df = pd.DataFrame(results)
+        # Built column by column from the per-column lists; no per-row dicts
+        df = pd.DataFrame(result.data, columns=result.columns)
         if 'incident_date' in df.columns:
             # Ensure it's parsed correctly if stored as TEXT
             df['incident_date'] = pd.to_datetime(
                 df['incident_date'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
         st.dataframe(df)
     except ImportError:
-        st.table(results)  # Fallback to basic table
+        st.table(result.data)  # Fallback to basic table
+
+
+def display_result_page(result_query: Dict[str, Any], total: Optional[int], key: str):
+    """Fetches and shows the selected page of a retrieval query's results."""
+    if total == 0:
+        st.info("No matching claims found in the database.")
+        return
+    page = 1
+    if total is None or total > RESULT_PAGE_SIZE:
+        page = st.number_input(
+            "Page", min_value=1, value=1, key=key,
+            max_value=math.ceil(total / RESULT_PAGE_SIZE) if total is not None else None)
+    # Served from db_utils.result_cache unless the database changed
+    result = run_page(result_query["sql"], tuple(result_query["params"]), page - 1, columnar=True)
+    if result.explain_error or result.error:
+        st.error(result.explain_error or result.error)
+        return
+    display_results_as_table(result)
+    first_row = (page - 1) * RESULT_PAGE_SIZE + 1
+    if result.row_count:
+        st.caption(f"Rows {first_row}-{first_row + result.row_count - 1}"
+                   + (f" of {total}" if total is not None else ""))
 
 
 # --- Display Chat History ---
-for message in st.session_state.messages:
+for message_index, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         # 1. Display main content
         st.markdown(message["content"])
@@ -93,11 +133,12 @@ for message in st.session_state.messages:
             if "sql_query" in message and message["sql_query"]:
                 with st.expander("Generated SQL Query" + (" (Validation Failed)" if not sql_query_valid else ""), expanded=True):
                     st.code(message["sql_query"], language="sql")
-            if "sql_results" in message:
+            if "result_query" in message:
                 # Show results only if SQL validation and execution succeeded
                 if sql_query_valid and sql_query_executed:
                     with st.expander("💾 Query Results", expanded=True):
-                        display_results_as_table(message["sql_results"])
+                        display_result_page(message["result_query"], message.get("result_count"),
+                                            key=f"result_page_{message_index}")
 
         # 4. Display Error (if any) at the end
         if error_occurred:
@@ -105,256 +146,53 @@ for message in st.session_state.messages:
 
 
 # --- Main Processing Logic ---
-SQLResponseTypeAdapter = TypeAdapter(SQLResponse)
-
-
-async def process_input(user_prompt: str):
-    intent_info: Optional[Intent] = None
-    sql_response: Optional[SQLResponse] = None
-    sql_results: Optional[List[Dict[str, Any]]] = None
-    extracted_data: Optional[PartialClaim] = None
-    extracted_data_dict = None
-    full_payload: Optional[ClaimCreate] = None
-    full_payload_dict = None
-    api_response_dict = None
-    error_message = None
-    final_content = "Processing..."
-
-    current_assistant_message = {"role": "assistant",
-                                 "content": final_content, "intent": None}
-    st.session_state.messages.append(current_assistant_message)
-    message_placeholder = st.empty()
-
-    try:
-        with message_placeholder.chat_message("assistant"):
-            with st.status("Processing your request...", expanded=True) as status:
-                # 1. Detect Intent
-                status.write("🤔 Determining your intent...")
-                intent_result = await intent_agent.run(user_prompt)
-                raw_intent_output = intent_result.data
-                if isinstance(raw_intent_output, str):
-                    intent_info = Intent.model_validate_json(raw_intent_output)
-                elif isinstance(raw_intent_output, dict):
-                    intent_info = Intent.model_validate(raw_intent_output)
-                elif isinstance(raw_intent_output, Intent):
-                    intent_info = raw_intent_output
-                else:
-                    raise TypeError(
-                        f"Unexpected intent output type: {type(raw_intent_output)}")
-
-                # Store intent
-                current_assistant_message["intent"] = intent_info.action
-                status.write(f"✅ Intent detected: **{intent_info.action}**")
-                # (Rest of intent processing...)
-
-                # --- Branch based on Intent ---
-                if intent_info.action == "create":
-                    status.update(label="Processing claim creation...")
-                    # 1a. Extract
-                    status.write("🧠 Extracting claim details...")
-                    extraction_result = await extraction_agent.run(user_prompt)
-                    raw_extract_output = extraction_result.data
-                    if isinstance(raw_extract_output, str):
-                        extracted_data = PartialClaim.model_validate_json(
-                            raw_extract_output)
-                    elif isinstance(raw_extract_output, PartialClaim):
-                        extracted_data = raw_extract_output
+# Turns run in pipeline.run_turn on a background event loop shared by all
+# sessions; the script thread only replays their progress into st.status.
+
+
+@st.cache_resource
+def get_turn_worker() -> "TurnWorker":
+    # Imported here: the pipeline pulls in the HTTP stack, and its agents
+    # pull in pydantic-ai; none of it is needed to draw the first page
+    from turn_worker import TurnWorker
+    worker = TurnWorker()
+    worker.warm_up()
+    return worker
+
+
+def run_turn_with_status(user_prompt: str) -> Dict[str, Any]:
+    job = get_turn_worker().submit(user_prompt)
+    with st.chat_message("assistant"):
+        with st.status("Processing your request...", expanded=True) as status:
+            replayed = 0
+            live_lines = {}  # Streamed partial output, one line per agent
+            while True:
+                finished = job.done()  # Checked first so no trailing event is missed
+                for kind, payload in job.status.events_since(replayed):
+                    if kind == "write":
+                        status.write(payload)
+                    elif kind == "stream":
+                        key, text = payload
+                        if key not in live_lines:
+                            live_lines[key] = status.empty()
+                        live_lines[key].markdown(text)
                     else:
-                        raise TypeError(
-                            f"Unexpected extraction output type: {type(raw_extract_output)}")
-
-                    extracted_data_dict = extracted_data.model_dump(
-                        exclude_none=True)
-                    status.write(
-                        f"📝 Extracted Info: {extracted_data_dict or 'None'}")
-                    # Store for display
-                    current_assistant_message["extracted_info"] = extracted_data_dict
-
-                    # 1b. Synthesize
-                    status.write("⚙️ Generating test data...")
-                    full_payload = synthesize_claim(extracted_data)
-                    full_payload_dict = full_payload.model_dump(mode='json')
-                    status.write(
-                        f"✅ Generated Full Payload: {full_payload_dict}")
-                    # Store for display
-                    current_assistant_message["payload"] = full_payload_dict
-
-                    # 1c. Post to API
-                    status.write(
-                        f"📤 Submitting claim via API to {API_BASE_URL}...")
-                    async with httpx.AsyncClient() as client:
-                        response = await client.post(f"{API_BASE_URL}/claims/", json=full_payload_dict)
-                        if response.status_code == 422:
-                            validation_error = HTTPValidationError(
-                                **response.json())
-                            error_detail = validation_error.model_dump_json(
-                                indent=2)
-                            raise httpx.HTTPStatusError(
-                                f"API Validation Error (422): {error_detail}", request=response.request, response=response)
-                        response.raise_for_status()
-                        api_response_dict = response.json()
-                    status.write(
-                        f"✔️ Claim submitted successfully via API! Response: {api_response_dict}")
-                    # Store for display
-                    current_assistant_message["response"] = api_response_dict
-
-                    response_claim = Claim(**api_response_dict)
-                    final_content = f"Test claim created successfully via API! Claim ID: `{response_claim.id}`."
-
-                elif intent_info.action == "retrieve":
-                    status.update(label="Processing claim retrieval...")
-                    if not intent_info.query_details:
-                        final_content = "Okay, you want to find some claims. Can you be more specific? For example, tell me a claim ID, policy holder name, or status."
-                        status.update(label="Need more info",
-                                      state="complete", expanded=False)
-                        current_assistant_message["content"] = final_content
-                        return
-
-                    # 2a. Generate SQL
-                    status.write(
-                        f"✍️ Generating SQL query for: '{intent_info.query_details}'...")
-                    sql_agent_result = await sql_agent.run(intent_info.query_details)
-                    raw_sql_output = sql_agent_result.data
-                    try:
-                        if isinstance(raw_sql_output, str):
-                            sql_response = SQLResponseTypeAdapter.validate_json(
-                                raw_sql_output)
-                        elif isinstance(raw_sql_output, dict):
-                            sql_response = SQLResponseTypeAdapter.validate_python(
-                                raw_sql_output)
-                        elif isinstance(raw_sql_output, (SQLQuery, InvalidSQLRequest)):
-                            sql_response = raw_sql_output
-                        else:
-                            raise TypeError(
-                                f"Unexpected SQL agent output type: {type(raw_sql_output)}")
-                    except (PydanticValidationError, json.JSONDecodeError) as parse_error:
-                        raise TypeError(
-                            "SQL agent returned output that could not be parsed into SQLQuery or InvalidSQLRequest.") from parse_error
-
-                    if isinstance(sql_response, InvalidSQLRequest):
-                        status.update(label="SQL Generation Failed",
-                                      state="error", expanded=True)
-                        final_content = f"Sorry, I couldn't generate a query for that request: {sql_response.error_message}"
-                        error_message = final_content  # Store as error
-                    elif isinstance(sql_response, SQLQuery):
-                        status.write(f"📊 Generated SQL: `{sql_response.sql}`")
-                        # Store for display
-                        current_assistant_message["sql_query"] = sql_response.sql
-
-                        # 2b. Validate SQL
-                        status.write("🛡️ Validating generated SQL...")
-                        plan, explain_error = explain_sql(sql_response.sql)
-                        if explain_error:
-                            status.update(label="SQL Validation Failed",
-                                          state="error", expanded=True)
-                            final_content = f"I generated an SQL query, but it failed validation: {explain_error}. Please try rephrasing your request."
-                            error_message = final_content  # Store as error
-                        else:
-                            status.write(
-                                f"✅ SQL validation passed (EXPLAIN OK). Plan: {plan}")
-
-                            # 2c. Execute SQL (only if validation passed)
-                            status.write(
-                                "🔍 Executing query against local database...")
-                            sql_results, db_error = execute_sql(
-                                sql_response.sql)
-                            # Store results
-                            current_assistant_message["sql_results"] = sql_results
-
-                            if db_error:
-                                status.update(
-                                    label="SQL Execution Failed", state="error", expanded=True)
-                                final_content = f"I generated a valid query, but it failed to execute: {db_error}"
-                                error_message = final_content  # Store as error
-                            else:
-                                status.write(
-                                    f"✅ Found {len(sql_results)} matching claim(s).")
-                                final_content = f"Okay, I found {len(sql_results)} claim(s) matching your request. See the results below."
-                                if sql_response.explanation:
-                                    final_content += f"\n\nQuery Explanation: {sql_response.explanation}"
-                else:  # Intent is 'unknown'
-                    status.update(label="Request unclear",
-                                  state="complete", expanded=False)
-                    final_content = "I'm not sure how to help with that. I can create test claims or retrieve existing ones. Could you please clarify your request?"
-
-                # Update status to complete if no error occurred earlier
-                if not error_message:
-                    status.update(label="Processing Complete",
-                                  state="complete", expanded=False)
-
-    except httpx.HTTPStatusError as e:
-        error_message = f"API Error during claim creation: {e}"
-        final_content = "Sorry, there was an error submitting the claim to the API."
-        if 'status' in locals():
-            status.update(label="API Error", state="error", expanded=True)
-    except Exception as e:
-        error_message = f"An unexpected error occurred: {e}"
-        # Keep print for unexpected errors
-        print(f"*** Unexpected Error: {error_message}")
-        print(traceback.format_exc())  # Keep print for unexpected errors
-        final_content = "Sorry, an unexpected error occurred while processing your request."
-        if 'status' in locals():
-            status.update(label="Unexpected Error",
-                          state="error", expanded=True)
-
-    finally:
-        # Update the final content and error state in the message dictionary
-        current_assistant_message["content"] = final_content
-        if error_message:
-            current_assistant_message["error"] = error_message
-
-        # --- Rerender final message outside status, using the updated dict ---
-        # This logic now mirrors the main history display loop more closely
-        with message_placeholder.chat_message("assistant"):
-            # 1. Display main content
-            st.markdown(current_assistant_message["content"])
-
-            # 2. Display Intent (if detected)
-            intent_action = current_assistant_message.get("intent")
-            if intent_action:
-                st.caption(f"Intent: {intent_action}")
-
-            # 3. Display Details (each in its own expander if present)
-            error_occurred_final = current_assistant_message.get(
-                "error")  # Check error state again
-
-            if intent_action == "create":
-                if "extracted_info" in current_assistant_message:
-                    with st.expander("📝 Extracted Info", expanded=False):
-                        st.json(current_assistant_message["extracted_info"])
-                if "payload" in current_assistant_message:
-                    with st.expander("📊 Payload Sent" + (" (Attempted)" if error_occurred_final else ""), expanded=False):
-                        st.json(current_assistant_message["payload"])
-                if "response" in current_assistant_message:
-                    with st.expander("📄 API Response", expanded=False):
-                        st.json(current_assistant_message["response"])
-            elif intent_action == "retrieve":
-                sql_query_valid_final = not (
-                    error_occurred_final and "validation failed" in error_occurred_final)
-                sql_query_executed_final = not (
-                    error_occurred_final and "failed to execute" in error_occurred_final)
-
-                if "sql_query" in current_assistant_message:
-                    with st.expander("Generated SQL Query" + (" (Validation Failed)" if not sql_query_valid_final else ""), expanded=True):
-                        st.code(
-                            current_assistant_message["sql_query"], language="sql")
-                if "sql_results" in current_assistant_message:
-                    if sql_query_valid_final and sql_query_executed_final:
-                        with st.expander("💾 Query Results", expanded=True):
-                            display_results_as_table(
-                                current_assistant_message["sql_results"])
-
-            # 4. Display Error (if any) at the end
-            if error_occurred_final:
-                st.error(f"Error Details: {error_occurred_final}")
+                        status.update(**payload)
+                    replayed += 1
+                if finished:
+                    break
+                time.sleep(STATUS_POLL_SECONDS)
+    return job.result()
 
 
 # --- Streamlit Input Handling ---
-# (Remains the same)
 if prompt := st.chat_input("Create a claim or ask to find one..."):
     st.chat_message("user").markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
-    # Run the main processing function
-    asyncio.run(process_input(prompt))
+    # Run the main processing on the background loop
+    st.session_state.messages.append(run_turn_with_status(prompt))
     # Rerun to display the latest state and clear the input box
     st.rerun()
+
+# After the page is drawn, start the shared worker (and its agent warm-up) if it is not running yet
+get_turn_worker()
@@ -0,0 +1,45 @@
+# claims_fts.py
+"""DDL for claims_fts, the full-text index over the free-text columns of claims.
+
+Shared by db_utils (sqlite3) and app/models.py (SQLAlchemy), which both
+create it on startup.
+"""
+
+# Stored as an external-content FTS5 table: claims holds the text and
+# claims_fts only the index, keyed by claims.rowid
+CLAIMS_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS claims_fts USING fts5(
+    incident_description,
+    policy_holder_name,
+    point_of_impact,
+    content='claims',
+    content_rowid='rowid',
+    tokenize='porter unicode61'
+);
+"""
+# Keep claims_fts in step with inserts, updates and deletes on claims
+CLAIMS_FTS_TRIGGER_STATEMENTS = [
+    """CREATE TRIGGER IF NOT EXISTS claims_fts_insert AFTER INSERT ON claims BEGIN
+    INSERT INTO claims_fts (rowid, incident_description, policy_holder_name, point_of_impact)
+    VALUES (new.rowid, new.incident_description, new.policy_holder_name, new.point_of_impact);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS claims_fts_delete AFTER DELETE ON claims BEGIN
+    INSERT INTO claims_fts (claims_fts, rowid, incident_description, policy_holder_name, point_of_impact)
+    VALUES ('delete', old.rowid, old.incident_description, old.policy_holder_name, old.point_of_impact);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS claims_fts_update
+AFTER UPDATE OF incident_description, policy_holder_name, point_of_impact ON claims BEGIN
+    INSERT INTO claims_fts (claims_fts, rowid, incident_description, policy_holder_name, point_of_impact)
+    VALUES ('delete', old.rowid, old.incident_description, old.policy_holder_name, old.point_of_impact);
+    INSERT INTO claims_fts (rowid, incident_description, policy_holder_name, point_of_impact)
+    VALUES (new.rowid, new.incident_description, new.policy_holder_name, new.point_of_impact);
+END""",
+]
+CLAIMS_FTS_TRIGGERS = "".join(f"{statement};\n" for statement in CLAIMS_FTS_TRIGGER_STATEMENTS)
+# One statement each, for drivers that cannot run a script
+CLAIMS_FTS_STATEMENTS = [CLAIMS_FTS_SCHEMA] + CLAIMS_FTS_TRIGGER_STATEMENTS
+
+CLAIMS_FTS_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'claims_fts'"
+# Re-indexes every claim: rows written before claims_fts existed, or after a
+# VACUUM, which may renumber the implicit rowids of claims
+CLAIMS_FTS_REBUILD = "INSERT INTO claims_fts (claims_fts) VALUES ('rebuild')"
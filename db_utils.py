@@ -1,19 +1,55 @@
 # db_utils.py
+import asyncio
+import dataclasses
+import re
 import sqlite3
 import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
 from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import List, Tuple, Any, Dict, Optional
 from models import Claim  # Use the Claim model from models.py
-import logfire  # Optional logging
+from claims_fts import CLAIMS_FTS_EXISTS, CLAIMS_FTS_REBUILD, CLAIMS_FTS_SCHEMA, CLAIMS_FTS_TRIGGERS
+import metrics
+from metrics import get_logfire
 
 DATABASE_FILE = "claims.db"
 
-# Optional: configure logfire
-logfire.configure(send_to_logfire="if-token-present")
+# --- Read Connection Pool Settings ---
+POOL_SIZE = int(os.getenv("CLAIMS_DB_POOL_SIZE", "4"))
+POOL_TIMEOUT_SECONDS = float(os.getenv("CLAIMS_DB_POOL_TIMEOUT", "5"))
+# Page cache per connection in KiB (applied as a negative cache_size)
+CACHE_SIZE_KIB = int(os.getenv("CLAIMS_DB_CACHE_SIZE_KIB", "16384"))
+MMAP_SIZE_BYTES = int(os.getenv("CLAIMS_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Prepared statements kept per connection, keyed by SQL text
+STATEMENT_CACHE_SIZE = 256
+
+# --- Retrieval Limits ---
+MAX_RESULT_ROWS = int(os.getenv("CLAIMS_MAX_RESULT_ROWS", "1000"))
+STATEMENT_TIMEOUT_SECONDS = float(os.getenv("CLAIMS_SQL_TIMEOUT", "5"))
+# SQLite VM instructions between statement timeout checks
+PROGRESS_HANDLER_INTERVAL = 10000
+# Rows per fetchmany() call when building columnar results
+FETCH_CHUNK_ROWS = 1000
+# Rows per page of retrieval results shown in the chat
+RESULT_PAGE_SIZE = int(os.getenv("CLAIMS_RESULT_PAGE_SIZE", "100"))
+
+# --- Result Cache Settings ---
+RESULT_CACHE_ENABLED = os.getenv("CLAIMS_RESULT_CACHE", "1") == "1"
+# Approximate in-memory size of all cached results
+RESULT_CACHE_MAX_BYTES = int(os.getenv("CLAIMS_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Larger results are not cached, so one big scan cannot flush the cache
+RESULT_CACHE_MAX_ENTRY_BYTES = RESULT_CACHE_MAX_BYTES // 8
+
 
 # --- Database Schema ---
 # Matches the SQLAlchemy definition provided
-DB_SCHEMA = """
+CLAIMS_TABLE_SCHEMA = """
 CREATE TABLE IF NOT EXISTS claims (
     id TEXT PRIMARY KEY,
     policy_holder_name TEXT,
@@ -31,52 +67,493 @@ CREATE TABLE IF NOT EXISTS claims (
 );
 """
 
+# Managed secondary indexes (name -> indexed expression); keep in sync with
+# the Index definitions on app.models.Claim
+CLAIM_INDEXES = {
+    "ix_claims_status": "status",
+    "ix_claims_company_status": "company, status",
+    "ix_claims_adjuster_name": "adjuster_name",
+    "ix_claims_policy_holder_name": "policy_holder_name",
+    "ix_claims_incident_date_id": "incident_date, id",
+    "ix_claims_incident_day": "date(incident_date)",
+}
+
+# Tables and indexes, as shown to sql_agent
+DB_QUERY_SCHEMA = CLAIMS_TABLE_SCHEMA + "".join(
+    f"CREATE INDEX IF NOT EXISTS {name} ON claims ({expression});\n"
+    for name, expression in CLAIM_INDEXES.items()
+) + CLAIMS_FTS_SCHEMA
+DB_SCHEMA = DB_QUERY_SCHEMA + CLAIMS_FTS_TRIGGERS
+
+# (query, plan) pairs of recently explained queries, read by index_advisor
+RECENT_QUERY_PLANS: deque = deque(maxlen=200)
+
+_schema_initialized = False
+
+
+def initialize_database():
+    """Creates the claims table, its managed indexes and claims_fts if they are missing."""
+    global _schema_initialized
+    if _schema_initialized:
+        return
+    conn = sqlite3.connect(DATABASE_FILE)
+    try:
+        fts_exists = conn.execute(CLAIMS_FTS_EXISTS).fetchone()
+        conn.executescript(DB_SCHEMA)
+        if not fts_exists:
+            with conn:
+                conn.execute(CLAIMS_FTS_REBUILD)
+        # The journal mode persists in the database file, so it is left to the
+        # API's storage profile (CLAIMS_DB_PROFILE in app/database.py)
+    finally:
+        conn.close()
+    _schema_initialized = True
+
+
+def vacuum_database(database: str = DATABASE_FILE):
+    """VACUUMs the database, then rebuilds claims_fts, whose rowids VACUUM may have renumbered."""
+    conn = sqlite3.connect(database, isolation_level=None)
+    try:
+        conn.execute("VACUUM")
+        conn.execute(CLAIMS_FTS_REBUILD)
+    finally:
+        conn.close()
+
+
+class ReadConnectionPool:
+    """Bounded, thread-safe pool of read-only SQLite connections.
+
+    Connections are opened lazily up to `size` and handed out LIFO, so the
+    most recently used (warmest) connection is reused first.
+    """
+
+    def __init__(self, database: str, size: int = POOL_SIZE,
+                 timeout: float = POOL_TIMEOUT_SECONDS):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self.hits = 0  # Acquired an idle connection immediately
+        self.opens = 0  # Opened a new connection
+        self.waits = 0  # Had to wait for a connection to be released
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+
+    def _open(self) -> sqlite3.Connection:
+        uri = Path(self.database).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # Return rows as dictionary-like objects
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                conn = self._open()
+            except sqlite3.Error:
+                with self._lock:
+                    self._opened -= 1
+                raise
+            with self._lock:
+                self.opens += 1
+            return conn
+
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise sqlite3.OperationalError(
+                f"Timed out after {self.timeout}s waiting for a database connection")
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += time.perf_counter() - started
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        self._idle.put(conn)
+
+    def close(self):
+        """Closes idle connections."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            acquisitions = self.hits + self.opens + self.waits
+            return {
+                "size": self.size,
+                "open_connections": self._opened,
+                "idle_connections": self._idle.qsize(),
+                "hits": self.hits,
+                "opens": self.opens,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "hit_rate": self.hits / acquisitions if acquisitions else 0.0,
+                "avg_wait_ms": 1000 * self.wait_seconds / self.waits if self.waits else 0.0,
+            }
+
+
+read_pool = ReadConnectionPool(DATABASE_FILE)
+
 
 @contextmanager
 def get_db_connection():
-    """Provides a database connection."""
-    # Use check_same_thread=False only if needed for specific frameworks like Streamlit
-    # Be cautious about thread safety if modifying data concurrently.
-    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionary-like objects
+    """Provides a pooled read-only database connection."""
+    # The database must exist before it can be opened with mode=ro
+    initialize_database()
+    conn = read_pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        read_pool.release(conn)
+
+
+@dataclass
+class QueryResult:
+    """Plan and rows of a retrieval query run by run_query."""
+    plan: List[Dict[str, Any]] = field(default_factory=list)
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    explain_error: Optional[str] = None  # The query failed EXPLAIN (validation)
+    error: Optional[str] = None  # The query failed while executing
+    truncated: bool = False  # More than max_rows rows matched
+    elapsed_ms: float = 0.0
+    cached: bool = False  # Served from result_cache without touching SQLite
+    # Columnar mode: column names and one value list per column instead of `rows`
+    columns: List[str] = field(default_factory=list)
+    data: Optional[Dict[str, List[Any]]] = None
+
+    @property
+    def row_count(self) -> int:
+        if self.data is not None:
+            return len(next(iter(self.data.values()), []))
+        return len(self.rows)
+
+
+NOT_SELECT_ERROR = "Error: Only SELECT queries are allowed for retrieval."
+
+# SQL whose result depends on the clock or randomness, not just the data;
+# data_version cannot tell when it goes stale, so it is never cached
+VOLATILE_SQL_PATTERN = re.compile(
+    r"'now'|\bcurrent_(?:date|time|timestamp)\b|\brandom(?:blob)?\s*\(", re.IGNORECASE)
+
+# String literals and quoted identifiers, which canonicalize_sql leaves as is
+_QUOTED_PATTERN = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+def canonicalize_sql(query: str) -> str:
+    """Collapses whitespace, lowercases and drops the trailing semicolon outside quoted text."""
+    parts = _QUOTED_PATTERN.split(query.strip().rstrip(";").strip())
+    # split() with a capturing group puts the quoted parts at odd indexes
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower() for i, part in enumerate(parts))
+
 
+def _estimate_size(result: "QueryResult") -> int:
+    """Approximate bytes held by a result's rows or columns."""
+    if result.data is not None:
+        return sum(sys.getsizeof(values) + sum(map(sys.getsizeof, values))
+                   for values in result.data.values())
+    size = sys.getsizeof(result.rows)
+    for row in result.rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+    return size
 
-@logfire.instrument("Executing SQL: {query}")  # Optional instrumentation
-def execute_sql(query: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-    """Executes a SELECT SQL query and returns results or an error message."""
-    # Basic validation (already done in SQL agent, but good defense)
+
+class ResultCache:
+    """LRU cache of run_query results, bounded by their approximate size.
+
+    Entries are keyed on the canonical SQL, parameters and row cap, and are
+    valid for one `PRAGMA data_version` of the database: read on a dedicated
+    connection that never writes, it changes whenever any other connection,
+    in this process or another (e.g. the API), commits. A version change
+    drops the whole cache, since any commit may touch the claims table.
+    """
+
+    def __init__(self, database: str, max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = RESULT_CACHE_MAX_ENTRY_BYTES):
+        self.database = database
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[tuple, Tuple[QueryResult, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._version: Optional[int] = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.skipped_large = 0
+
+    def data_version(self) -> int:
+        """Current data_version, clearing the cache if it moved. Call with the lock held."""
+        if self._watcher is None:
+            uri = Path(self.database).resolve().as_uri() + "?mode=ro"
+            self._watcher = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self._version = version
+        return version
+
+    @staticmethod
+    def key(query: str, params: Tuple[Any, ...], max_rows: Optional[int], columnar: bool) -> tuple:
+        return canonicalize_sql(query), tuple(params), max_rows, columnar
+
+    def get(self, key: tuple) -> Tuple[Optional[QueryResult], int]:
+        """Returns (cached result or None, data_version to store a fresh result under)."""
+        with self._lock:
+            version = self.data_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, version
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], version
+
+    def put(self, key: tuple, result: QueryResult, version: int):
+        size = _estimate_size(result)
+        with self._lock:
+            if size > self.max_entry_bytes:
+                self.skipped_large += 1
+                return
+            # A commit landed while the query ran; its rows may already be stale
+            if self.data_version() != version:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "skipped_large": self.skipped_large,
+            }
+
+
+result_cache = ResultCache(DATABASE_FILE)
+
+
+def _fetch_columnar(cursor: sqlite3.Cursor, max_rows: Optional[int]) -> Tuple[List[str], Dict[str, List[Any]], bool]:
+    """Reads plain tuple rows in chunks into one list per column.
+
+    Returns (columns, data, truncated); no per-row dict or Row is built.
+    """
+    columns = [description[0] for description in cursor.description]
+    values: List[List[Any]] = [[] for _ in columns]
+    limit = None if max_rows is None else max_rows + 1
+    fetched = 0
+    while limit is None or fetched < limit:
+        chunk = cursor.fetchmany(FETCH_CHUNK_ROWS if limit is None else min(FETCH_CHUNK_ROWS, limit - fetched))
+        if not chunk:
+            break
+        fetched += len(chunk)
+        for column_values, chunk_values in zip(values, zip(*chunk)):
+            column_values.extend(chunk_values)
+    truncated = max_rows is not None and fetched > max_rows
+    if truncated:
+        for column_values in values:
+            del column_values[max_rows:]
+    return columns, dict(zip(columns, values)), truncated
+
+
+def _explain(conn: sqlite3.Connection, query: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+    with metrics.span("sql_explain"):
+        return [dict(row) for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+@metrics.instrument("Running SQL: {query}")  # Optional instrumentation
+def run_query(query: str, params: Tuple[Any, ...] = (), max_rows: Optional[int] = MAX_RESULT_ROWS,
+              timeout: float = STATEMENT_TIMEOUT_SECONDS, columnar: bool = False,
+              plan_label: Optional[str] = None, record_plan: bool = True) -> QueryResult:
+    """Validates a SELECT with EXPLAIN QUERY PLAN, then executes it on the same connection.
+
+    At most max_rows rows are fetched (None for no cap), and the statement is
+    interrupted once it has run for `timeout` seconds. Successful results are
+    served from result_cache until the database changes, unless they depend
+    on the current time or random(). With `columnar`, the
+    result holds `columns` and `data` (a value list per column) instead of
+    `rows`. The plan is recorded for index_advisor under `plan_label`
+    (default: the query itself) unless `record_plan` is False.
+    """
+    result = QueryResult()
     if not query.strip().upper().startswith("SELECT"):
-        return [], "Error: Only SELECT queries are allowed for retrieval."
+        result.explain_error = NOT_SELECT_ERROR
+        return result
+
+    plan_label = query if plan_label is None else plan_label
+    started = time.perf_counter()
+    use_cache = RESULT_CACHE_ENABLED and not VOLATILE_SQL_PATTERN.search(query)
+    if use_cache:
+        initialize_database()
+        cache_key = ResultCache.key(query, params, max_rows, columnar)
+        cached, version = result_cache.get(cache_key)
+        if cached is not None:
+            if record_plan:
+                RECENT_QUERY_PLANS.append((plan_label, cached.plan))
+            return dataclasses.replace(
+                cached, cached=True, elapsed_ms=1000 * (time.perf_counter() - started))
+    deadline = time.monotonic() + timeout
+    with get_db_connection() as conn:
+        # Returning non-zero from the progress handler interrupts the statement
+        conn.set_progress_handler(
+            lambda: 1 if time.monotonic() > deadline else 0, PROGRESS_HANDLER_INTERVAL)
+        try:
+            try:
+                result.plan = _explain(conn, query, params)
+                if record_plan:
+                    RECENT_QUERY_PLANS.append((plan_label, result.plan))
+            except sqlite3.Error as e:
+                result.explain_error = f"Error explaining SQL: {e}"
+                return result
+
+            execute_started = time.perf_counter()
+            try:
+                cursor = conn.cursor()
+                if columnar:
+                    cursor.row_factory = None  # Plain tuples
+                    cursor.execute(query, params)
+                    result.columns, result.data, result.truncated = _fetch_columnar(cursor, max_rows)
+                else:
+                    cursor.execute(query, params)
+                    if max_rows is None:
+                        rows = cursor.fetchall()
+                    else:
+                        rows = cursor.fetchmany(max_rows + 1)
+                        result.truncated = len(rows) > max_rows
+                        rows = rows[:max_rows]
+                    result.rows = [dict(row) for row in rows]
+                cursor.close()
+            except sqlite3.Error as e:
+                if time.monotonic() > deadline:
+                    result.error = f"Error executing SQL: query exceeded the {timeout:g}s statement timeout"
+                else:
+                    result.error = f"Error executing SQL: {e}"
+                get_logfire().error("SQL Execution Failed", sql=query,
+                                    error=result.error)  # Log error
+            metrics.registry.observe("sql_execute", 1000 * (time.perf_counter() - execute_started))
+        finally:
+            conn.set_progress_handler(None, 0)
+            result.elapsed_ms = 1000 * (time.perf_counter() - started)
+    if use_cache and result.error is None:
+        result_cache.put(cache_key, result, version)
+    return result
+
+
+def _as_subquery(query: str) -> str:
+    # The newline keeps a trailing "-- comment" from swallowing the closing parenthesis
+    return query.strip().rstrip(";").rstrip() + "\n"
+
+
+def run_page(query: str, params: Tuple[Any, ...] = (), page: int = 0,
+             page_size: int = RESULT_PAGE_SIZE,
+             timeout: float = STATEMENT_TIMEOUT_SECONDS, columnar: bool = False) -> QueryResult:
+    """Fetches one page (0-based) of a SELECT's rows, in the query's own order.
+
+    The plan is recorded for index_advisor under the caller's query, not the
+    LIMIT/OFFSET wrapper.
+    """
+    if not query.strip().upper().startswith("SELECT"):
+        return QueryResult(explain_error=NOT_SELECT_ERROR)
+    return run_query(f"SELECT * FROM ({_as_subquery(query)}) LIMIT ? OFFSET ?",
+                     tuple(params) + (page_size, page * page_size),
+                     max_rows=page_size, timeout=timeout, columnar=columnar, plan_label=query)
 
-    results = []
-    error = None
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            # Fetch all results as dictionaries
-            results = [dict(row) for row in cursor.fetchall()]
-    except sqlite3.Error as e:
-        error = f"Error executing SQL: {e}"
-        logfire.error("SQL Execution Failed", sql=query,
-                      error=str(e))  # Log error
 
-    return results, error
+def count_rows(query: str, params: Tuple[Any, ...] = (),
+               timeout: float = STATEMENT_TIMEOUT_SECONDS) -> Tuple[Optional[int], Optional[str]]:
+    """Returns (number of rows the SELECT matches, error).
+
+    The plan is not recorded; run_page() already records the query's plan.
+    """
+    if not query.strip().upper().startswith("SELECT"):
+        return None, NOT_SELECT_ERROR
+    result = run_query(f"SELECT COUNT(*) AS total FROM ({_as_subquery(query)})",
+                       params, max_rows=1, timeout=timeout, record_plan=False)
+    error = result.explain_error or result.error
+    if error:
+        return None, error
+    return result.rows[0]["total"], None
+
+
+async def run_query_async(query: str, params: Tuple[Any, ...] = (),
+                          max_rows: Optional[int] = MAX_RESULT_ROWS,
+                          timeout: float = STATEMENT_TIMEOUT_SECONDS,
+                          columnar: bool = False) -> QueryResult:
+    """run_query() on a worker thread, so the caller's event loop keeps serving other turns.
+
+    The read pool bounds how many of these run at once; callers beyond
+    POOL_SIZE wait for a connection on their worker thread, not on the loop.
+    """
+    return await asyncio.to_thread(run_query, query, params, max_rows, timeout, columnar)
 
 
-def explain_sql(query: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-    """Runs EXPLAIN QUERY PLAN on a SQL query."""
-    plan = []
-    error = None
+async def run_page_async(query: str, params: Tuple[Any, ...] = (), page: int = 0,
+                         page_size: int = RESULT_PAGE_SIZE, columnar: bool = False) -> QueryResult:
+    return await asyncio.to_thread(
+        run_page, query, params, page, page_size, STATEMENT_TIMEOUT_SECONDS, columnar)
+
+
+async def count_rows_async(query: str, params: Tuple[Any, ...] = ()) -> Tuple[Optional[int], Optional[str]]:
+    return await asyncio.to_thread(count_rows, query, params)
+
+
+def explain_sql(query: str, params: Tuple[Any, ...] = ()) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Runs EXPLAIN QUERY PLAN on a SELECT, as run_query() does before executing it."""
+    if not query.strip().upper().startswith("SELECT"):
+        return [], NOT_SELECT_ERROR
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"EXPLAIN QUERY PLAN {query}")
-            plan = [dict(row) for row in cursor.fetchall()]
+            plan = _explain(conn, query, params)
     except sqlite3.Error as e:
-        error = f"Error explaining SQL: {e}"
-    return plan, error
+        return [], f"Error explaining SQL: {e}"
+    RECENT_QUERY_PLANS.append((query, plan))
+    return plan, None
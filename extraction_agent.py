@@ -1,6 +1,7 @@
 # extraction_agent.py
-from pydantic_ai import Agent
+import functools
 from models import PartialClaim
+from metrics import get_logfire
 import os
 from dotenv import load_dotenv
 
@@ -21,12 +22,7 @@ if not OPENAI_API_KEY:
         "OPENAI_API_KEY is not set. Please set it as a global variable or in the .env file.")
 
 # Corrected: Use generic type parameter for output_type
-extraction_agent = Agent[None, PartialClaim](  # Specify None for DepsT, PartialClaim for OutputT
-    # model='openai:gpt-4o', # Or 'anthropic:claude-3-5-sonnet-latest' etc.
-    # Set default, but allow override via env var
-    model=os.getenv("PYDANTIC_AI_EXTRACTION_MODEL", GPT4_MODEL),
-    # output_type=PartialClaim, # REMOVED: This was causing the TypeError
-    system_prompt="""
+EXTRACTION_SYSTEM_PROMPT = """
     You are an AI assistant helping to extract information for an auto insurance claim.
     Analyze the user's message and extract ONLY the details they explicitly mention regarding the claim.
     Extract details like:
@@ -55,6 +51,19 @@ extraction_agent = Agent[None, PartialClaim](  # Specify None for DepsT, Partial
     Example 3:
     User: Someone scratched the front passenger side door in the parking lot. I didn’t see who did it. The car is a 2022 Honda Civic.
     Output: {"vehicle_make": "Honda", "vehicle_model": "Civic", "vehicle_year": 2022, "incident_description": "Scratched in the parking lot. Didn't see who did it", "point_of_impact": "front passenger side door"}
-    """,
-    instrument=True  # Optional: Enable Logfire tracing if configured
-)
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def get_extraction_agent():
+    """Builds the extraction agent on first use; pydantic-ai is imported here, not at module import."""
+    from pydantic_ai import Agent
+    get_logfire()  # Agent traces (instrument=True) go through the configured logfire
+    return Agent[None, PartialClaim](  # Specify None for DepsT, PartialClaim for OutputT
+        # model='openai:gpt-4o', # Or 'anthropic:claude-3-5-sonnet-latest' etc.
+        # Set default, but allow override via env var
+        model=os.getenv("PYDANTIC_AI_EXTRACTION_MODEL", GPT4_MODEL),
+        # output_type=PartialClaim, # REMOVED: This was causing the TypeError
+        system_prompt=EXTRACTION_SYSTEM_PROMPT,
+        instrument=True  # Optional: Enable Logfire tracing if configured
+    )
@@ -0,0 +1,141 @@
+# http_clients.py
+import asyncio
+import atexit
+import os
+import random
+import threading
+import weakref
+from typing import Any, Coroutine, Dict, TypeVar
+
+import httpx
+
+MAX_CONNECTIONS = int(os.getenv("CLAIMS_HTTP_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CLAIMS_HTTP_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("CLAIMS_HTTP_KEEPALIVE_EXPIRY", "30"))
+TIMEOUT_SECONDS = float(os.getenv("CLAIMS_HTTP_TIMEOUT", "10"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("CLAIMS_HTTP_CONNECT_TIMEOUT", "5"))
+MAX_RETRIES = int(os.getenv("CLAIMS_HTTP_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 5.0
+# The claims API, which the chat pipeline posts created claims to
+CLAIMS_API_URL = "http://127.0.0.1:8000"
+
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+# Failures where the request was never sent, so any method can be retried
+RETRY_UNSENT_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Also a pooled keep-alive connection closed by the server under us, which
+# may have happened after the request was processed
+RETRY_EXCEPTIONS = RETRY_UNSENT_EXCEPTIONS + (httpx.RemoteProtocolError,)
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+T = TypeVar("T")
+
+
+class ClientRegistry:
+    """Lazily created, shared AsyncClients, one per (event loop, base URL).
+
+    An AsyncClient's connections belong to the loop that opened them, so each
+    loop gets its own client; clients of loops that have closed are dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = \
+            weakref.WeakKeyDictionary()
+        # Overrides for tests and benchmarks, e.g. httpx.ASGITransport(app)
+        self.transports: Dict[str, httpx.AsyncBaseTransport] = {}
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for stale_loop in [l for l in self._clients if l.is_closed()]:
+                del self._clients[stale_loop]
+            clients = self._clients.setdefault(loop, {})
+            client = clients.get(base_url)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    base_url=base_url,
+                    transport=self.transports.get(base_url),
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS),
+                    timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                )
+                clients[base_url] = client
+            return client
+
+    async def aclose_loop(self):
+        """Closes the clients of the running loop."""
+        with self._lock:
+            clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+    def close_all(self):
+        """Closes every client whose loop can still run its shutdown."""
+        with self._lock:
+            loops = list(self._clients.keys())
+        for loop in loops:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                # Owned by another thread (e.g. a background loop)
+                try:
+                    asyncio.run_coroutine_threadsafe(
+                        self._aclose_on(loop), loop).result(timeout=5)
+                except Exception:
+                    pass
+            else:
+                loop.run_until_complete(self._aclose_on(loop))
+
+    async def _aclose_on(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            clients = self._clients.pop(loop, {})
+        for client in clients.values():
+            await client.aclose()
+
+
+registry = ClientRegistry()
+atexit.register(registry.close_all)
+
+
+def get_client(base_url: str) -> httpx.AsyncClient:
+    return registry.get(base_url)
+
+
+async def request(client: httpx.AsyncClient, method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """Sends a request, retrying failures with jittered backoff.
+
+    Idempotent methods, and requests carrying an Idempotency-Key header, are
+    retried on 5xx responses and connection errors. Others (e.g. POST
+    /claims/) are retried only when the request was never sent, since the
+    server may already have committed it.
+    """
+    headers = httpx.Headers(kwargs.get("headers"))
+    retry_sent = method.upper() in IDEMPOTENT_METHODS or IDEMPOTENCY_KEY_HEADER in headers
+    retry_exceptions = RETRY_EXCEPTIONS if retry_sent else RETRY_UNSENT_EXCEPTIONS
+    attempt = 0
+    while True:
+        try:
+            response = await client.request(method, url, **kwargs)
+            if not retry_sent or response.status_code not in RETRY_STATUS_CODES or attempt >= MAX_RETRIES:
+                return response
+        except retry_exceptions:
+            if attempt >= MAX_RETRIES:
+                raise
+        # Full jitter: uniform over [0, capped exponential backoff]
+        await asyncio.sleep(random.uniform(
+            0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)))
+        attempt += 1
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    """asyncio.run() that closes the run's HTTP clients before its loop is closed."""
+    async def main() -> T:
+        try:
+            return await coro
+        finally:
+            await registry.aclose_loop()
+    return asyncio.run(main())
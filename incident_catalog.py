@@ -0,0 +1,282 @@
+# incident_catalog.py
+import csv
+import difflib
+import functools
+import itertools
+import math
+import os
+import re
+import string
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# CSV with incident_description,point_of_impact columns, used instead of the built-in catalog
+INCIDENT_CATALOG_FILE = os.getenv("CLAIMS_INCIDENT_CATALOG")
+# Below this score a description is left unmatched (the caller picks a random impact)
+MIN_MATCH_SCORE = float(os.getenv("CLAIMS_INCIDENT_MIN_SCORE", "0.35"))
+# Unknown words are matched to catalog words at least this similar (difflib ratio)
+FUZZY_CUTOFF = 0.8
+FUZZY_CACHE_SIZE = 50_000
+
+IncidentEntry = Tuple[str, str]  # (incident_description, point_of_impact)
+
+INCIDENT_IMPACT_MAPPING: List[IncidentEntry] = [
+    ("Rear-ended at a traffic signal", "Rear bumper"),
+    ("Hit a parked car while reversing", "Rear bumper"),
+    ("Backed into a pole", "Rear bumper"),
+    ("Minor collision in parking lot, front impact", "Front bumper"),
+    ("Hit a deer crossing the road", "Front bumper"),
+    ("Collision with debris on highway", "Front bumper/Underbody"),
+    ("Side-swiped driver side while parked", "Driver side"),
+    ("T-boned on the driver side at intersection", "Driver side"),
+    ("Another car merged into driver side lane", "Driver side"),
+    ("Side-swiped passenger side", "Passenger side"),
+    ("Scraped passenger side against wall", "Passenger side"),
+    ("Object fell on roof", "Roof"),
+    ("Hail damage", "Roof/Hood/Trunk"),
+    ("Windshield cracked by rock from truck", "Windshield"),
+    ("Hit a pothole causing tire/wheel damage", "Wheel/Suspension"),
+    ("Skidded on ice and hit guardrail", "Front/Side"),
+    ("Hydroplaned into a ditch", "Underbody/Side"),
+    ("Vandalism - keyed along the side", "Driver side/Passenger side"),
+    ("Attempted theft, broken window", "Driver side window/Passenger side window"),
+    ("Fender bender in slow traffic", "Front bumper/Rear bumper")
+]
+
+# --- Built-in catalog: incident templates expanded over the vocabularies below ---
+
+PLACES = [
+    "at a traffic signal", "at a stop sign", "at an intersection", "in a parking lot",
+    "in a parking garage", "on the highway", "on the freeway", "in slow traffic",
+    "in a drive-through", "at a gas station", "on a residential street", "in a roundabout",
+]
+OTHER_VEHICLES = [
+    "another car", "a truck", "a pickup truck", "an SUV", "a bus", "a delivery van",
+    "a motorcycle", "a taxi", "a semi truck",
+]
+FIXED_OBJECTS = [
+    "a pole", "a wall", "a fence", "a pillar", "a bollard", "a tree", "a mailbox",
+    "a guardrail", "a shopping cart corral", "a fire hydrant",
+]
+ANIMALS = ["a deer", "a dog", "a moose", "an elk", "a cow", "a wild boar"]
+ROAD_CONDITIONS = ["on ice", "on black ice", "on a wet road", "in the snow", "on gravel", "in heavy rain"]
+FALLING_OBJECTS = ["a tree branch", "a tree", "debris", "a construction beam", "roof tiles", "a light fixture"]
+
+INCIDENT_TEMPLATES: List[IncidentEntry] = [
+    ("Rear-ended by {vehicle} {place}", "Rear bumper"),
+    ("{Vehicle} rear-ended me {place}", "Rear bumper"),
+    ("Hit {vehicle} while reversing {place}", "Rear bumper"),
+    ("Backed into {object} {place}", "Rear bumper"),
+    ("Reversed into {object}", "Rear bumper"),
+    ("Rear-ended {vehicle} {place}", "Front bumper"),
+    ("Ran into {object} {place}, front impact", "Front bumper"),
+    ("Hit {animal} crossing the road", "Front bumper"),
+    ("Collided with {animal} at night", "Front bumper/Hood"),
+    ("Head-on collision with {vehicle} {place}", "Front bumper/Hood"),
+    ("Ran over debris {place}", "Front bumper/Underbody"),
+    ("T-boned on the driver side by {vehicle} {place}", "Driver side"),
+    ("Side-swiped on the driver side by {vehicle} {place}", "Driver side"),
+    ("{Vehicle} merged into my driver side {place}", "Driver side"),
+    ("Driver door hit by {vehicle} {place}", "Driver side door"),
+    ("T-boned on the passenger side by {vehicle} {place}", "Passenger side"),
+    ("Side-swiped on the passenger side by {vehicle} {place}", "Passenger side"),
+    ("{Vehicle} merged into my passenger side {place}", "Passenger side"),
+    ("Scraped the passenger side against {object} {place}", "Passenger side"),
+    ("Scraped the driver side against {object} {place}", "Driver side"),
+    ("Skidded {condition} and hit {object}", "Front/Side"),
+    ("Lost control {condition} and slid into {object}", "Front/Side"),
+    ("Hydroplaned {condition} into a ditch", "Underbody/Side"),
+    ("Spun out {condition} and rolled over", "Roof/Side"),
+    ("{Falling} fell on the roof {place}", "Roof"),
+    ("{Falling} fell on the hood {place}", "Hood"),
+    ("Hail storm dented the car {place}", "Roof/Hood/Trunk"),
+    ("Windshield cracked by a rock from {vehicle} {place}", "Windshield"),
+    ("Rear window shattered by {falling} {place}", "Rear window"),
+    ("Hit a pothole {place} causing tire and wheel damage", "Wheel/Suspension"),
+    ("Curbed the wheel {place}", "Wheel/Suspension"),
+    ("Keyed along the side {place}", "Driver side/Passenger side"),
+    ("Vandalized {place}, paint scratched on both sides", "Driver side/Passenger side"),
+    ("Break-in {place}, driver side window smashed", "Driver side window"),
+    ("Break-in {place}, passenger side window smashed", "Passenger side window"),
+    ("Side mirror knocked off by {vehicle} {place}", "Side mirror"),
+    ("Fender bender with {vehicle} {place}", "Front bumper/Rear bumper"),
+    ("Door dinged by {vehicle} {place}", "Driver side/Passenger side"),
+    ("Trunk lid damaged by {vehicle} backing up {place}", "Trunk"),
+    ("Undercarriage scraped on a speed bump {place}", "Underbody"),
+]
+
+TEMPLATE_VALUES: Dict[str, List[str]] = {
+    "place": PLACES,
+    "vehicle": OTHER_VEHICLES,
+    "object": FIXED_OBJECTS,
+    "animal": ANIMALS,
+    "condition": ROAD_CONDITIONS,
+    "falling": FALLING_OBJECTS,
+}
+
+
+def _expand(template: str) -> List[str]:
+    """All descriptions of a template; a capitalized {Field} capitalizes its value."""
+    fields = [name for _, name, _, _ in string.Formatter().parse(template) if name]
+    value_lists = [TEMPLATE_VALUES[name.lower()] for name in fields]
+    descriptions = []
+    for values in itertools.product(*value_lists):
+        filled = {name: value[0].upper() + value[1:] if name[0].isupper() else value
+                  for name, value in zip(fields, values)}
+        descriptions.append(template.format(**filled))
+    return descriptions
+
+
+def build_catalog() -> List[IncidentEntry]:
+    """The built-in catalog: INCIDENT_IMPACT_MAPPING plus every expanded template."""
+    catalog = list(INCIDENT_IMPACT_MAPPING)
+    seen = {description for description, _ in catalog}
+    for template, impact in INCIDENT_TEMPLATES:
+        for description in _expand(template):
+            if description not in seen:
+                seen.add(description)
+                catalog.append((description, impact))
+    return catalog
+
+
+def load_catalog(path: str) -> List[IncidentEntry]:
+    """Reads incident_description,point_of_impact rows from a CSV file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        catalog = [(row["incident_description"].strip(), row["point_of_impact"].strip())
+                   for row in csv.DictReader(f)
+                   if row.get("incident_description") and row.get("point_of_impact")]
+    if not catalog:
+        raise ValueError(f"Incident catalog {path!r} has no incident_description,point_of_impact rows")
+    return catalog
+
+
+def write_catalog(path: str, catalog: Sequence[IncidentEntry]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["incident_description", "point_of_impact"])
+        writer.writerows(catalog)
+
+
+# --- Matching ---
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an the and or of on in at to by my me i was is it its while from with into onto "
+    "got get had has have been be this that some someone car vehicle".split())
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _tokens(text: str) -> List[str]:
+    """Stemmed content words; a hyphenated word also yields its joined form (side-swiped -> sideswip)."""
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        parts = word.split("-")
+        if len(parts) > 1:
+            tokens.append(_stem("".join(parts)))
+        tokens.extend(_stem(part) for part in parts if part not in STOPWORDS)
+    return [token for token in tokens if token not in STOPWORDS and not token.isdigit()]
+
+
+class IncidentMatcher:
+    """Finds the catalog entry closest to a free-text incident description.
+
+    Catalog words are kept in an inverted index (word -> entry ids) with IDF
+    weights, so a lookup only touches entries sharing a word with the
+    description. An entry's score is the Dice overlap of the IDF mass of the
+    shared words; words not in the catalog are mapped to similar catalog
+    words (typos, other inflections) with a reduced weight. Unless the
+    description or the entry has a single word, at least two words must be
+    shared, so one generic word ("damage") is not a match on its own.
+    """
+
+    def __init__(self, catalog: Sequence[IncidentEntry], min_score: float = MIN_MATCH_SCORE):
+        self.catalog = list(catalog)
+        self.min_score = min_score
+        # Descriptions copied verbatim from the catalog skip scoring
+        self.exact = {description.lower(): impact for description, impact in reversed(self.catalog)}
+        entry_tokens = [set(_tokens(description)) for description, _ in self.catalog]
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for entry_id, tokens in enumerate(entry_tokens):
+            for token in tokens:
+                postings[token].append(entry_id)
+        n = len(self.catalog)
+        self.idf = {token: math.log(1 + n / len(ids)) for token, ids in postings.items()}
+        self.postings = {token: tuple(ids) for token, ids in postings.items()}
+        self.entry_mass = [sum(self.idf[token] for token in tokens) for tokens in entry_tokens]
+        self.entry_words = [len(tokens) for tokens in entry_tokens]
+        # Fuzzy candidates are bucketed by first letter
+        self._vocabulary: Dict[str, List[str]] = defaultdict(list)
+        for token in self.idf:
+            self._vocabulary[token[0]].append(token)
+        self._resolve = functools.lru_cache(maxsize=FUZZY_CACHE_SIZE)(self._resolve_token)
+
+    def _resolve_token(self, token: str) -> Tuple[Tuple[str, float], ...]:
+        """Catalog words standing for token, with a similarity weight."""
+        if token in self.idf:
+            return ((token, 1.0),)
+        if len(token) < 4:
+            return ()
+        candidates = [word for word in self._vocabulary.get(token[0], ()) if abs(len(word) - len(token)) <= 2]
+        close = difflib.get_close_matches(token, candidates, n=1, cutoff=FUZZY_CUTOFF)
+        return tuple((word, difflib.SequenceMatcher(None, token, word).ratio()) for word in close)
+
+    def best_match(self, description: str) -> Optional[Tuple[IncidentEntry, float]]:
+        """The best-scoring catalog entry and its score (0..1), or None below min_score."""
+        scores: Dict[int, float] = {}
+        shared_words: Dict[int, int] = {}
+        get, get_shared = scores.get, shared_words.get
+        query_mass = 0.0
+        query_tokens = set(_tokens(description))
+        for token in query_tokens:
+            for word, similarity in self._resolve(token):
+                weight = self.idf[word] * similarity
+                query_mass += weight
+                for entry_id in self.postings[word]:
+                    scores[entry_id] = get(entry_id, 0.0) + weight
+                    shared_words[entry_id] = get_shared(entry_id, 0) + 1
+        best_id, best = None, 0.0
+        entry_mass, entry_words = self.entry_mass, self.entry_words
+        required = min(2, len(query_tokens))
+        for entry_id, shared in scores.items():
+            if shared_words[entry_id] < min(required, entry_words[entry_id]):
+                continue
+            score = 2 * shared / (query_mass + entry_mass[entry_id])
+            if score > best:
+                best_id, best = entry_id, score
+        if best_id is None or best < self.min_score:
+            return None
+        return self.catalog[best_id], best
+
+    def match(self, description: str) -> Optional[str]:
+        """The point of impact of the closest catalog entry, if any is close enough."""
+        impact = self.exact.get(description.strip().lower())
+        if impact is not None:
+            return impact
+        found = self.best_match(description)
+        return found[0][1] if found else None
+
+
+@functools.lru_cache(maxsize=None)
+def get_catalog() -> Tuple[IncidentEntry, ...]:
+    return tuple(load_catalog(INCIDENT_CATALOG_FILE) if INCIDENT_CATALOG_FILE else build_catalog())
+
+
+@functools.lru_cache(maxsize=None)
+def get_matcher() -> IncidentMatcher:
+    return IncidentMatcher(get_catalog())
+
+
+if __name__ == "__main__":
+    # python incident_catalog.py incidents.csv -- export the built-in catalog as a starting point
+    if len(sys.argv) != 2:
+        sys.exit("usage: python incident_catalog.py OUTPUT.csv")
+    entries = build_catalog()
+    write_catalog(sys.argv[1], entries)
+    print(f"Wrote {len(entries)} incidents to {sys.argv[1]}")
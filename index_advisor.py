@@ -0,0 +1,138 @@
+# index_advisor.py
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from db_utils import CLAIM_INDEXES, RECENT_QUERY_PLANS, explain_sql
+
+# Columns of the claims table that can be indexed
+CLAIM_COLUMNS = [
+    "id", "policy_holder_name", "policy_number", "vehicle_make", "vehicle_model",
+    "vehicle_year", "incident_date", "incident_description", "adjuster_name",
+    "status", "company", "claim_office", "point_of_impact",
+]
+
+# "SCAN claims" on recent SQLite, "SCAN TABLE claims" on older versions.
+# "SCAN claims USING [COVERING] INDEX ..." walks an index and is not reported.
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (TABLE )?claims\b(?!.*USING)", re.IGNORECASE)
+WHERE_CLAUSE_PATTERN = re.compile(
+    r"\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|;|$)", re.IGNORECASE | re.DOTALL)
+DATE_EXPRESSION_PATTERN = re.compile(r"\bdate\s*\(\s*incident_date\s*\)", re.IGNORECASE)
+
+
+@dataclass
+class IndexAdvice:
+    """A suggested index and the scanning queries that would use it."""
+    index_name: str
+    expression: str
+    queries: List[str] = field(default_factory=list)
+    note: Optional[str] = None
+
+    @property
+    def create_statement(self) -> str:
+        return f"CREATE INDEX IF NOT EXISTS {self.index_name} ON claims ({self.expression});"
+
+
+def is_full_scan(plan: List[Dict[str, Any]]) -> bool:
+    """True if an EXPLAIN QUERY PLAN result contains a full scan of claims."""
+    return any(FULL_SCAN_PATTERN.search(str(step.get("detail", ""))) for step in plan)
+
+
+def _filter_columns(query: str) -> Tuple[List[str], List[str], bool]:
+    """Returns (equality columns, range columns, unindexable LIKE used) from the WHERE clause."""
+    match = WHERE_CLAUSE_PATTERN.search(query)
+    if not match:
+        return [], [], False
+    where = match.group(1)
+    if DATE_EXPRESSION_PATTERN.search(where):
+        # Only the expression index can serve date(incident_date) filters
+        return ["date(incident_date)"], [], False
+
+    equality, ranges = [], []
+    leading_wildcard_like = False
+    for column in CLAIM_COLUMNS:
+        for operator in re.findall(
+                rf"\b{column}\s*(=|IN\b|LIKE\b|<=|>=|<|>|BETWEEN\b)(\s*'%)?", where, re.IGNORECASE):
+            op, wildcard = operator[0].upper(), operator[1]
+            if op == "LIKE" and wildcard:
+                leading_wildcard_like = True
+            elif op in ("=", "IN", "LIKE"):
+                if column not in equality:
+                    equality.append(column)
+            elif column not in ranges:
+                ranges.append(column)
+    return equality, [c for c in ranges if c not in equality], leading_wildcard_like
+
+
+def suggest_index(query: str) -> Optional[IndexAdvice]:
+    """Suggests an index for a query, reusing a managed index name when one matches."""
+    equality, ranges, leading_wildcard_like = _filter_columns(query)
+    # Equality columns first, then at most one range column
+    columns = equality + ranges[:1]
+    if not columns:
+        if leading_wildcard_like:
+            return IndexAdvice(
+                index_name="", expression="", queries=[query],
+                note="LIKE '%...%' cannot use a B-tree index; search incident_description, "
+                     "policy_holder_name and point_of_impact with claims_fts MATCH instead.")
+        return None
+
+    expression = ", ".join(columns)
+    for name, managed_expression in CLAIM_INDEXES.items():
+        managed_columns = [column.strip() for column in managed_expression.split(",")]
+        # Equality columns can come in any order; the range column must follow them
+        if (len(managed_columns) == len(columns)
+                and set(managed_columns[:len(equality)]) == set(equality)
+                and managed_columns[len(equality):] == columns[len(equality):]):
+            return IndexAdvice(
+                index_name=name, expression=managed_expression, queries=[query],
+                note="A matching managed index exists but was not used; check that it was created.")
+    name = "ix_claims_" + "_".join(re.sub(r"\W+", "_", column).strip("_") for column in columns)
+    return IndexAdvice(index_name=name, expression=expression, queries=[query])
+
+
+def advise(plans: Optional[Iterable[Tuple[str, List[Dict[str, Any]]]]] = None) -> List[IndexAdvice]:
+    """Groups full-scan queries from recent EXPLAIN plans by the index that would serve them."""
+    if plans is None:
+        plans = list(RECENT_QUERY_PLANS)
+    advice: Dict[str, IndexAdvice] = {}
+    for query, plan in plans:
+        if not is_full_scan(plan):
+            continue
+        suggestion = suggest_index(query)
+        if suggestion is None:
+            continue
+        key = suggestion.expression or suggestion.note or ""
+        if key in advice:
+            if query not in advice[key].queries:
+                advice[key].queries.append(query)
+        else:
+            advice[key] = suggestion
+    return sorted(advice.values(), key=lambda item: len(item.queries), reverse=True)
+
+
+def format_report(advice: List[IndexAdvice]) -> str:
+    if not advice:
+        return "No full scans of claims in recent query plans."
+    lines = []
+    for item in advice:
+        header = f"SCAN claims in {len(item.queries)} query(s)"
+        lines.append(f"{header}: {item.create_statement}" if item.expression else header)
+        if item.note:
+            lines.append(f"  Note: {item.note}")
+        for query in item.queries[:3]:
+            lines.append(f"  e.g. {query.strip()}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Usage: python index_advisor.py "SELECT ..." ["SELECT ..." ...]
+    explained = []
+    for sql in sys.argv[1:]:
+        plan, error = explain_sql(sql)
+        if error:
+            print(error)
+        else:
+            explained.append((sql, plan))
+    print(format_report(advise(explained)))
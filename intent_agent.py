@@ -1,16 +1,38 @@
 # intent_agent.py
-from pydantic_ai import Agent
+import functools
 from models import Intent
+from metrics import get_logfire
+import json
 import os
 
 
 GPT4_MODEL = "openai:gpt-4.1-nano"
 
+# Few-shot examples for the system prompt; intent_classifier also trains on them
+INTENT_EXAMPLES = [
+    ("I hit a deer this morning.", "create", None),
+    ("Can you find the claim for policy number POL-123456?",
+     "retrieve", "policy number POL-123456"),
+    ("What's the status of claim CLM-9876543210?",
+     "retrieve", "claim ID CLM-9876543210"),
+    ("Show me all claims handled by Ryan Cooper.", "retrieve", "adjuster Ryan Cooper"),
+    ("List claims for Beta Insurance that are in progress.", "retrieve",
+     "Beta Insurance claims with status Repair in Progress"),
+    ("Thanks!", "unknown", None),
+    ("Tell me about my options.", "unknown", None),
+]
+
+
+def format_examples(examples) -> str:
+    return "\n\n".join(
+        f"    User: {message}\n    Output: "
+        + json.dumps({"action": action, "query_details": details})
+        for message, action, details in examples
+    )
+
+
 # Use a model good at classification/intent recognition (often smaller/faster models work well)
-intent_agent = Agent[None, Intent](  # No deps needed, outputs Intent model
-    model=os.getenv("PYDANTIC_AI_INTENT_MODEL", GPT4_MODEL),  # Cheaper/faster model
-    # output_type=Intent, # Defined via generic
-    system_prompt="""
+INTENT_SYSTEM_PROMPT = f"""
     Your task is to determine the user's intent based on their message regarding an auto insurance claim.
     Classify the intent as one of: 'create', 'retrieve', or 'unknown'.
 
@@ -24,26 +46,18 @@ intent_agent = Agent[None, Intent](  # No deps needed, outputs Intent model
     Respond ONLY with the JSON object matching the 'Intent' schema.
 
     Examples:
-    User: I hit a deer this morning.
-    Output: {"action": "create", "query_details": null}
-
-    User: Can you find the claim for policy number POL-123456?
-    Output: {"action": "retrieve", "query_details": "policy number POL-123456"}
-
-    User: What's the status of claim CLM-9876543210?
-    Output: {"action": "retrieve", "query_details": "claim ID CLM-9876543210"}
-
-    User: Show me all claims handled by Ryan Cooper.
-    Output: {"action": "retrieve", "query_details": "adjuster Ryan Cooper"}
-
-    User: List claims for Beta Insurance that are in progress.
-    Output: {"action": "retrieve", "query_details": "Beta Insurance claims with status Repair in Progress"}
-
-    User: Thanks!
-    Output: {"action": "unknown", "query_details": null}
-
-    User: Tell me about my options.
-    Output: {"action": "unknown", "query_details": null}
-    """,
-    instrument=True  # Optional
-)
+{format_examples(INTENT_EXAMPLES)}
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def get_intent_agent():
+    """Builds the intent agent on first use; pydantic-ai is imported here, not at module import."""
+    from pydantic_ai import Agent
+    get_logfire()  # Agent traces (instrument=True) go through the configured logfire
+    return Agent[None, Intent](  # No deps needed, outputs Intent model
+        model=os.getenv("PYDANTIC_AI_INTENT_MODEL", GPT4_MODEL),  # Cheaper/faster model
+        # output_type=Intent, # Defined via generic
+        system_prompt=INTENT_SYSTEM_PROMPT,
+        instrument=True  # Optional
+    )
@@ -0,0 +1,261 @@
+# intent_classifier.py
+import functools
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from models import Intent
+from intent_agent import INTENT_EXAMPLES
+from query_builder import PHRASE_PATTERN
+
+CLASSIFIER_ENABLED = os.getenv("CLAIMS_INTENT_FAST_PATH", "1") == "1"
+# Below this confidence the turn is deferred to intent_agent
+CONFIDENCE_THRESHOLD = float(os.getenv("CLAIMS_INTENT_CONFIDENCE", "0.85"))
+# LLM-labelled turns are appended here and used as training data
+TRAFFIC_LOG_FILE = os.getenv("CLAIMS_INTENT_LOG", "intent_log.jsonl")
+MAX_TRAINING_EXAMPLES = 2000
+# The model only resolves turns on its own once it has seen this many examples
+MIN_MODEL_EXAMPLES = 200
+RETRAIN_EVERY = 25  # New LLM labels between retrains
+
+CLAIM_ID_PATTERN = re.compile(r"\bCLM-\d{10}\b", re.IGNORECASE)
+POLICY_NUMBER_PATTERN = re.compile(r"\bPOL-\d{6,8}\b", re.IGNORECASE)
+SMALL_TALK_PATTERN = re.compile(
+    r"^\s*(thanks|thank you|thx|hi|hello|hey|ok|okay|cool|great|bye|goodbye"
+    r"|good (morning|afternoon|evening))\b[\s!.,]*(you|a lot|so much)?[\s!.]*$",
+    re.IGNORECASE)
+RETRIEVE_PATTERN = re.compile(
+    r"^\s*(show|list|find|get|search|look up|lookup|display|fetch|which|how many)\b"
+    r"|\bstatus of\b|\bclaims? (for|with|handled by|from)\b",
+    re.IGNORECASE)
+# Dates a retrieval can filter on: ISO dates, month names and relative days
+DATE_PATTERN = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}\b|\b(jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|june?|july?"
+    r"|aug(ust)?|sep(t|tember)?|oct(ober)?|nov(ember)?|dec(ember)?)\b"
+    r"|\b(today|yesterday|last (week|month|year)|this (week|month|year))\b",
+    re.IGNORECASE)
+CREATE_PATTERN = re.compile(
+    r"\b(hit|rear-ended|crashed|collided|accident|wrecked|scratched|keyed|vandali[sz]ed|dented"
+    r"|t-boned|side-swiped|sideswiped|backed into|hail|pothole|hydroplaned|skidded"
+    r"|file a claim|new claim|report an? (accident|incident))\b",
+    re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r"clm-\d+|pol-\d+|[a-z]+(?:'[a-z]+)?|\d+")
+
+
+@dataclass
+class Classification:
+    intent: Optional[Intent]  # Best guess, even when not confident
+    confidence: float
+    source: str  # "rule", "model" or "none"
+    # False for guesses from an under-trained model, or retrievals without a filter
+    trusted: bool = True
+
+    @property
+    def confident(self) -> bool:
+        return self.trusted and self.intent is not None and self.confidence >= CONFIDENCE_THRESHOLD
+
+
+def _tokens(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token.startswith("clm-"):
+            token = "<claim_id>"
+        elif token.startswith("pol-"):
+            token = "<policy_number>"
+        elif token.isdigit():
+            token = "<number>"
+        tokens.append(token)
+    return tokens
+
+
+def _features(text: str) -> Counter:
+    tokens = _tokens(text)
+    return Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+
+class TfidfLogisticRegression:
+    """TF-IDF over unigrams and bigrams with a softmax logistic regression, in pure Python."""
+
+    def __init__(self, epochs: int = 15, learning_rate: float = 0.5, l2: float = 1e-4):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.labels: List[str] = []
+        self.idf: Dict[str, float] = {}
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.bias: Dict[str, float] = {}
+
+    def _vectorize(self, text: str) -> Dict[str, float]:
+        counts = _features(text)
+        vector = {f: (1 + math.log(c)) * self.idf[f] for f, c in counts.items() if f in self.idf}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {f: v / norm for f, v in vector.items()}
+
+    def fit(self, texts: List[str], labels: List[str]) -> "TfidfLogisticRegression":
+        self.labels = sorted(set(labels))
+        documents = [_features(text) for text in texts]
+        document_frequency = Counter(f for document in documents for f in document)
+        n = len(documents)
+        self.idf = {f: math.log((1 + n) / (1 + df)) + 1 for f, df in document_frequency.items()}
+        vectors = [self._vectorize(text) for text in texts]
+        self.weights = {label: defaultdict(float) for label in self.labels}
+        self.bias = {label: 0.0 for label in self.labels}
+
+        for _ in range(self.epochs):
+            for vector, target in zip(vectors, labels):
+                probabilities = self._probabilities(vector)
+                for label in self.labels:
+                    gradient = probabilities[label] - (1.0 if label == target else 0.0)
+                    self.bias[label] -= self.learning_rate * gradient
+                    weights = self.weights[label]
+                    for f, value in vector.items():
+                        weights[f] -= self.learning_rate * (gradient * value + self.l2 * weights[f])
+        return self
+
+    def _probabilities(self, vector: Dict[str, float]) -> Dict[str, float]:
+        scores = {
+            label: self.bias[label] + sum(self.weights[label].get(f, 0.0) * v for f, v in vector.items())
+            for label in self.labels
+        }
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probabilities = self._probabilities(self._vectorize(text))
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+
+def _has_filter(message: str) -> bool:
+    """Whether a retrieval names something concrete: an id, status, company or date."""
+    return bool(CLAIM_ID_PATTERN.search(message) or POLICY_NUMBER_PATTERN.search(message)
+                or PHRASE_PATTERN.search(message) or DATE_PATTERN.search(message))
+
+
+def _retrieve_details(message: str) -> str:
+    """query_details for a locally classified retrieval, mirroring the agent's format."""
+    details = [f"claim ID {m.upper()}" for m in CLAIM_ID_PATTERN.findall(message)]
+    details += [f"policy number {m.upper()}" for m in POLICY_NUMBER_PATTERN.findall(message)]
+    return ", ".join(details) or message.strip()
+
+
+class IntentClassifier:
+    """Rule + TF-IDF/logistic-regression intent classifier that runs before intent_agent."""
+
+    def __init__(self, log_path: Optional[str] = TRAFFIC_LOG_FILE):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._examples: List[Tuple[str, str]] = [
+            (message, action) for message, action, _ in INTENT_EXAMPLES]
+        self._new_labels = 0
+        self.model: Optional[TfidfLogisticRegression] = None
+        self.model_examples = 0
+        self.turns = 0
+        self.resolved = 0
+        self.compared = 0  # Deferred turns with a local guess to compare
+        self.agreed = 0
+        self._load_traffic_log()
+        self._train()
+
+    def _load_traffic_log(self):
+        if not self.log_path or not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                    self._examples.append((record["message"], record["action"]))
+                except (ValueError, KeyError):
+                    continue  # Skip partially written lines
+
+    def _train(self):
+        with self._lock:
+            examples = self._examples[-MAX_TRAINING_EXAMPLES:]
+            self._new_labels = 0
+        labels = [action for _, action in examples]
+        model = None
+        if len(set(labels)) >= 2:
+            model = TfidfLogisticRegression().fit([m for m, _ in examples], labels)
+        with self._lock:
+            self.model = model
+            self.model_examples = len(examples)
+
+    def _classify_rules(self, message: str) -> Optional[Classification]:
+        if SMALL_TALK_PATTERN.match(message):
+            return Classification(Intent(action="unknown"), 1.0, "rule")
+        mentions_id = CLAIM_ID_PATTERN.search(message) or POLICY_NUMBER_PATTERN.search(message)
+        creating = CREATE_PATTERN.search(message)
+        retrieving = RETRIEVE_PATTERN.search(message)
+        if (mentions_id or retrieving) and not creating:
+            # A vague request ("show me my claims") goes to intent_agent, which
+            # asks the user to be more specific instead of guessing the SQL
+            return Classification(
+                Intent(action="retrieve", query_details=_retrieve_details(message)),
+                1.0 if mentions_id else 0.9, "rule", trusted=_has_filter(message))
+        if creating and not (mentions_id or retrieving):
+            return Classification(Intent(action="create"), 0.9, "rule")
+        return None
+
+    def classify(self, message: str) -> Classification:
+        """Classifies a message; callers use the intent only if `confident`."""
+        if not CLASSIFIER_ENABLED:
+            return Classification(None, 0.0, "none")
+        classification = self._classify_rules(message)
+        if classification is None:
+            with self._lock:
+                model, model_examples = self.model, self.model_examples
+            if model is None:
+                classification = Classification(None, 0.0, "none")
+            else:
+                action, confidence = model.predict(message)
+                details = _retrieve_details(message) if action == "retrieve" else None
+                classification = Classification(
+                    Intent(action=action, query_details=details), confidence, "model",
+                    trusted=model_examples >= MIN_MODEL_EXAMPLES
+                    and (action != "retrieve" or _has_filter(message)))
+        with self._lock:
+            self.turns += 1
+            if classification.confident:
+                self.resolved += 1
+        return classification
+
+    def record_llm_result(self, message: str, classification: Classification, llm_intent: Intent):
+        """Records intent_agent's answer for a deferred turn: agreement stats and training data."""
+        with self._lock:
+            if classification.intent is not None:
+                self.compared += 1
+                if classification.intent.action == llm_intent.action:
+                    self.agreed += 1
+            self._examples.append((message, llm_intent.action))
+            self._new_labels += 1
+            retrain = self._new_labels >= RETRAIN_EVERY
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as log_file:
+                log_file.write(json.dumps({"message": message, "action": llm_intent.action}) + "\n")
+        if retrain:
+            # Retrain off the request path; the old model serves until the swap
+            threading.Thread(target=self._train, daemon=True).start()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "resolved_locally": self.resolved,
+                "resolved_share": self.resolved / self.turns if self.turns else 0.0,
+                "llm_comparisons": self.compared,
+                "agreement_rate": self.agreed / self.compared if self.compared else 0.0,
+                "training_examples": min(len(self._examples), MAX_TRAINING_EXAMPLES),
+            }
+
+
+@functools.lru_cache(maxsize=None)
+def get_intent_classifier() -> IntentClassifier:
+    """Trains the classifier on first use, so importing the module stays cheap."""
+    return IntentClassifier()
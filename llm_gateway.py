@@ -0,0 +1,378 @@
+# llm_gateway.py
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+import metrics
+
+# Send intent, extraction and SQL agent calls through the gateway
+GATEWAY_ENABLED = os.getenv("CLAIMS_LLM_GATEWAY", "1") == "1"
+# Provider limits shared by every agent in this process (0 disables a limit)
+REQUESTS_PER_MINUTE = int(os.getenv("CLAIMS_LLM_RPM", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("CLAIMS_LLM_TPM", "200000"))
+# Calls in flight: starts at the maximum, halves on a 429 and grows back by ~1 per window of successes
+MAX_CONCURRENCY = int(os.getenv("CLAIMS_LLM_MAX_CONCURRENCY", "16"))
+MIN_CONCURRENCY = 1
+# Tokens reserved per call before its usage is known (system prompt + output), plus ~4 characters per prompt token
+TOKENS_PER_CALL = int(os.getenv("CLAIMS_LLM_TOKENS_PER_CALL", "1000"))
+CHARS_PER_TOKEN = 4
+# 429 handling: retries per call and jittered exponential backoff (a Retry-After header wins)
+MAX_RETRIES = int(os.getenv("CLAIMS_LLM_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+# Waiters re-check the buckets at least this often; finished calls give back unused reserved tokens
+BUCKET_POLL_SECONDS = 0.1
+# Identical prompts to the same agent share one in-flight call
+COALESCE_ENABLED = os.getenv("CLAIMS_LLM_COALESCE", "1") == "1"
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """True for HTTP 429s, as raised by pydantic-ai (ModelHTTPError) or the openai client."""
+    while error is not None:
+        if getattr(error, "status_code", None) == 429:
+            return True
+        error = error.__cause__
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None) or getattr(error.__cause__, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(prompt: str) -> int:
+    return TOKENS_PER_CALL + len(prompt) // CHARS_PER_TOKEN
+
+
+class TokenBucket:
+    """Allows `per_minute` units per minute, with up to one minute's worth in a burst.
+
+    Thread-safe and not bound to an event loop; waiting is done by the caller.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0  # Units per second
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, amount: float) -> float:
+        """Takes `amount` and returns 0, or returns the seconds until it will be available."""
+        amount = min(amount, self.capacity)  # A call larger than the bucket waits for a full one
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.level >= amount:
+                self.level -= amount
+                return 0.0
+            return (amount - self.level) / self.rate
+
+    def adjust(self, amount: float):
+        """Takes (positive) or returns (negative) units after the fact; the level may go negative."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level - amount)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease (AIMD).
+
+    Waiters are granted slots in FIFO order. Grants go through
+    call_soon_threadsafe, so turns on different event loops (e.g. the
+    chatbot's worker loop and a benchmark) share one limit.
+    """
+
+    def __init__(self, max_limit: int = MAX_CONCURRENCY, min_limit: int = MIN_CONCURRENCY):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.last_decrease = 0.0  # monotonic time of the last decrease
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+            if future.done() and not future.cancelled():
+                self.release()  # Granted just before the cancellation
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._grant_waiters()
+
+    def _grant_waiters(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            loop, future = self._waiters.popleft()
+            self.in_flight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: "asyncio.Future[None]"):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def on_success(self):
+        with self._lock:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._grant_waiters()
+
+    def on_rate_limited(self, admitted_at: float):
+        """Halves the limit, once per burst: calls admitted before the last decrease do not count."""
+        with self._lock:
+            if admitted_at >= self.last_decrease:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.last_decrease = time.monotonic()
+
+
+@dataclass
+class GatewaySlot:
+    """One admitted call; report its usage so the TPM bucket is charged what it really used."""
+    agent: str
+    reserved_tokens: int
+    admitted_at: float = 0.0
+    used_tokens: Optional[int] = None
+    failed: bool = False
+    rate_limited: bool = False
+
+    def record_usage(self, result: Any):
+        try:
+            self.used_tokens = result.usage().total_tokens or None
+        except (AttributeError, TypeError):
+            pass
+        metrics.record_usage(self.agent, result)
+
+
+@dataclass
+class _InFlight:
+    task: "asyncio.Task[Any]"
+    loop: asyncio.AbstractEventLoop
+    waiters: int = 0
+
+
+@dataclass
+class GatewayStats:
+    calls: int = 0
+    coalesced: int = 0  # Callers that shared another caller's in-flight call
+    rate_limited: int = 0  # 429 responses
+    retries: int = 0
+    wait_seconds: float = 0.0
+    backoff_until: float = 0.0  # monotonic time before which no call is started
+    by_agent: Dict[str, int] = field(default_factory=dict)
+
+
+class LLMGateway:
+    """Admission control for every LLM call in the process.
+
+    A call waits for the requests-per-minute and tokens-per-minute buckets,
+    then for a concurrency slot. A 429 halves the concurrency limit, pauses
+    new calls for the backoff and is retried; identical in-flight prompts to
+    the same agent share one call. Queue depth, in-flight calls and the
+    current limit are exported as gauges, and each call's wait is timed as
+    the "llm_wait" stage.
+    """
+
+    def __init__(self, requests_per_minute: int = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = TOKENS_PER_MINUTE, max_concurrency: int = MAX_CONCURRENCY):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self._stats = GatewayStats()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Tuple[str, str], _InFlight] = {}
+        self._admitting = 0  # Calls waiting for the backoff, a bucket or a slot
+
+    async def _admit(self, agent: str, estimated_tokens: int) -> float:
+        """Waits for the backoff, both buckets and a concurrency slot; returns the seconds waited."""
+        started = time.perf_counter()
+        with self._lock:
+            self._admitting += 1
+        self._publish()
+        try:
+            while True:
+                wait = self._stats.backoff_until - time.monotonic()
+                if wait <= 0 and self.requests is not None:
+                    wait = self.requests.try_take(1)
+                if wait <= 0 and self.tokens is not None:
+                    wait = self.tokens.try_take(estimated_tokens)
+                    if wait > 0 and self.requests is not None:
+                        self.requests.adjust(-1)  # Give the request back while waiting for tokens
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, BUCKET_POLL_SECONDS))
+            try:
+                await self.limiter.acquire()
+            except BaseException:
+                self._refund(1, estimated_tokens)
+                raise
+        finally:
+            with self._lock:
+                self._admitting -= 1
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._stats.calls += 1
+            self._stats.wait_seconds += waited
+            self._stats.by_agent[agent] = self._stats.by_agent.get(agent, 0) + 1
+        metrics.registry.observe("llm_wait", 1000 * waited, agent=agent)
+        self._publish()
+        return waited
+
+    def _refund(self, requests: int, tokens: int):
+        if self.requests is not None:
+            self.requests.adjust(-requests)
+        if self.tokens is not None:
+            self.tokens.adjust(-tokens)
+
+    def _finish(self, slot: GatewaySlot):
+        self.limiter.release()
+        if slot.rate_limited:
+            # The provider counted the request; the tokens were not used
+            self._refund(0, slot.reserved_tokens)
+        elif not slot.failed:
+            if self.tokens is not None and slot.used_tokens is not None:
+                self.tokens.adjust(slot.used_tokens - slot.reserved_tokens)
+            self.limiter.on_success()
+        self._publish()
+
+    def _on_rate_limited(self, error: BaseException, slot: GatewaySlot, attempt: int):
+        """Shrinks the limit and pauses new calls for the backoff."""
+        delay = _retry_after(error)
+        if delay is None:
+            # Full jitter: uniform over [0, capped exponential backoff]
+            delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        self.limiter.on_rate_limited(slot.admitted_at)
+        with self._lock:
+            self._stats.rate_limited += 1
+            self._stats.backoff_until = max(self._stats.backoff_until, time.monotonic() + delay)
+        metrics.get_logfire().warn("LLM rate limited; pausing calls for {delay:.1f}s",
+                                   agent=slot.agent, delay=delay, error=str(error))
+
+    @asynccontextmanager
+    async def slot(self, agent: str, prompt: str, attempt: int = 0) -> AsyncIterator[GatewaySlot]:
+        """Admits one call, e.g. a streamed run; the body should call slot.record_usage(result).
+
+        A 429 raised in the body shrinks the limit and is re-raised; it is not retried here.
+        """
+        slot = GatewaySlot(agent, estimate_tokens(prompt))
+        if not GATEWAY_ENABLED:
+            yield slot
+            return
+        await self._admit(agent, slot.reserved_tokens)
+        slot.admitted_at = time.monotonic()
+        try:
+            yield slot
+        except BaseException as e:
+            slot.failed = True
+            if is_rate_limited(e):
+                slot.rate_limited = True
+                self._on_rate_limited(e, slot, attempt)
+            raise
+        finally:
+            self._finish(slot)
+
+    async def _call(self, agent: Any, name: str, prompt: str) -> Any:
+        attempt = 0
+        while True:
+            try:
+                async with self.slot(name, prompt, attempt) as slot:
+                    result = await agent.run(prompt)
+                    slot.record_usage(result)
+                    return result
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= MAX_RETRIES:
+                    raise
+            attempt += 1
+            with self._lock:
+                self._stats.retries += 1
+            # _admit waits out the backoff set by the 429
+
+    async def run(self, agent: Any, prompt: str, name: str) -> Any:
+        """agent.run(prompt) under the gateway's limits, sharing identical in-flight calls.
+
+        `name` labels the agent in metrics (e.g. "sql_agent"); token usage is
+        recorded here, once per real call.
+        """
+        if not GATEWAY_ENABLED:
+            result = await agent.run(prompt)
+            metrics.record_usage(name, result)
+            return result
+        if not COALESCE_ENABLED:
+            return await self._call(agent, name, prompt)
+
+        loop = asyncio.get_running_loop()
+        key = (name, prompt)
+        with self._lock:
+            shared = self._in_flight.get(key)
+            if shared is not None and shared.loop is loop and not shared.task.done():
+                self._stats.coalesced += 1
+            else:
+                shared = _InFlight(loop.create_task(self._call(agent, name, prompt)), loop)
+                self._in_flight[key] = shared
+                shared.task.add_done_callback(lambda _, key=key, shared=shared: self._forget(key, shared))
+            shared.waiters += 1
+        try:
+            # shield: one caller giving up (e.g. a discarded speculative run) must not cancel the others
+            return await asyncio.shield(shared.task)
+        finally:
+            with self._lock:
+                shared.waiters -= 1
+                abandoned = shared.waiters == 0 and not shared.task.done()
+            if abandoned:
+                shared.task.cancel()
+
+    def _forget(self, key: Tuple[str, str], shared: _InFlight):
+        with self._lock:
+            if self._in_flight.get(key) is shared:
+                del self._in_flight[key]
+
+    def _publish(self):
+        metrics.registry.set_gauges("llm_gateway", {
+            "queued": self._admitting,
+            "in_flight": self.limiter.in_flight,
+            "concurrency_limit": round(self.limiter.limit, 2),
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self._stats.calls,
+                "coalesced": self._stats.coalesced,
+                "rate_limited": self._stats.rate_limited,
+                "retries": self._stats.retries,
+                "avg_wait_ms": 1000 * self._stats.wait_seconds / self._stats.calls if self._stats.calls else 0.0,
+                "queued": self._admitting,
+                "in_flight": self.limiter.in_flight,
+                "concurrency_limit": round(self.limiter.limit, 2),
+                "backoff_remaining_s": round(max(0.0, self._stats.backoff_until - time.monotonic()), 2),
+                "calls_by_agent": dict(self._stats.by_agent),
+            }
+
+
+gateway = LLMGateway()
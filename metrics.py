@@ -0,0 +1,287 @@
+# metrics.py
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+# Append every stage timing and token count to this file (unset: no sink)
+METRICS_JSONL = os.getenv("CLAIMS_METRICS_JSONL")
+# Histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+# Recent samples per stage kept for p50/p95/p99
+PERCENTILE_WINDOW = 2000
+QUANTILES = (0.5, 0.95, 0.99)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@functools.lru_cache(maxsize=None)
+def get_logfire():
+    """Imports and configures logfire on first use; importing it is slow, so nothing does at startup."""
+    import logfire
+    logfire.configure(send_to_logfire="if-token-present")
+    return logfire
+
+
+def instrument(msg_template: str) -> Callable[[F], F]:
+    """logfire.instrument, applied on the function's first call instead of at import."""
+    def decorator(fn: F) -> F:
+        instrumented: Optional[Callable[..., Any]] = None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal instrumented
+            if instrumented is None:
+                instrumented = get_logfire().instrument(msg_template)(fn)
+            return instrumented(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values (q in 0..1)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def escape_label(value: Any) -> str:
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StageHistogram:
+    """Cumulative bucket counts plus a window of recent samples for percentiles."""
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.recent: Deque[float] = deque(maxlen=PERCENTILE_WINDOW)
+
+    def observe(self, ms: float):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.bucket_counts[i] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.recent.append(ms)
+
+    def summary(self) -> Dict[str, float]:
+        recent = sorted(self.recent)
+        summary = {"count": self.count, "mean_ms": self.sum_ms / self.count if self.count else 0.0}
+        for q in QUANTILES:
+            summary[f"p{int(q * 100)}_ms"] = percentile(recent, q)
+        return summary
+
+
+@dataclass
+class TurnTrace:
+    """Stage timings of one chat turn, shared by everything running in its context."""
+    turn_id: str
+    stages: Dict[str, float] = field(default_factory=dict)
+    tokens: Dict[str, int] = field(default_factory=dict)
+
+
+_current_turn: contextvars.ContextVar[Optional[TurnTrace]] = contextvars.ContextVar(
+    "current_turn", default=None)
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms and LLM token counters, with an optional JSONL sink."""
+
+    def __init__(self, jsonl_path: Optional[str] = METRICS_JSONL):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, StageHistogram] = {}
+        self.tokens: Dict[Tuple[str, str], int] = {}  # (agent, kind) -> tokens
+        self.gauges: Dict[str, Dict[str, float]] = {}  # family -> {stat: current value}
+        self.jsonl_path = jsonl_path
+        self._tail_offset = 0
+
+    def _write(self, record: Dict[str, Any]):
+        if not self.jsonl_path:
+            return
+        record = {"ts": time.time(), "pid": os.getpid(), **record}
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with self._lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            get_logfire().warn("Could not write metrics record: {error}", error=str(e))
+
+    def _observe(self, stage: str, ms: float):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = StageHistogram()
+            histogram.observe(ms)
+
+    def _add_tokens(self, agent: str, counts: Dict[str, int]):
+        with self._lock:
+            for kind, value in counts.items():
+                self.tokens[(agent, kind)] = self.tokens.get((agent, kind), 0) + value
+
+    def observe(self, stage: str, ms: float, **attributes: Any):
+        """Records one timing of `stage`, attributed to the current turn if there is one."""
+        self._observe(stage, ms)
+        trace = _current_turn.get()
+        if trace is not None:
+            trace.stages[stage] = trace.stages.get(stage, 0.0) + ms
+        self._write({"kind": "stage", "stage": stage, "ms": round(ms, 3),
+                     "turn_id": trace.turn_id if trace else None, **attributes})
+
+    def record_tokens(self, agent: str, counts: Dict[str, int]):
+        counts = {kind: value for kind, value in counts.items() if value}
+        if not counts:
+            return
+        self._add_tokens(agent, counts)
+        trace = _current_turn.get()
+        if trace is not None:
+            for kind, value in counts.items():
+                trace.tokens[kind] = trace.tokens.get(kind, 0) + value
+        self._write({"kind": "tokens", "agent": agent,
+                     "turn_id": trace.turn_id if trace else None, **counts})
+
+    def set_gauges(self, family: str, values: Dict[str, float]):
+        """Sets current values (e.g. queue depth); kept in memory only, not written to the sink."""
+        with self._lock:
+            self.gauges[family] = dict(values)
+
+    def ingest_jsonl(self, path: Optional[str] = None):
+        """Folds records other processes appended to the sink since the last call.
+
+        Lets the API's /metrics include the chatbot's turns; records written
+        by this process are skipped, since they were counted when observed.
+        """
+        path = path or self.jsonl_path
+        if not path or not os.path.exists(path):
+            return
+        with self._lock:
+            if os.path.getsize(path) < self._tail_offset:
+                self._tail_offset = 0  # Truncated or replaced
+            with open(path, "r", encoding="utf-8") as f:
+                f.seek(self._tail_offset)
+                lines = f.readlines()
+                # Leave a partially written last line for the next call
+                if lines and not lines[-1].endswith("\n"):
+                    lines.pop()
+                self._tail_offset += sum(len(line.encode("utf-8")) for line in lines)
+        own_pid = os.getpid()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("pid") == own_pid:
+                continue
+            if record.get("kind") == "stage":
+                self._observe(record["stage"], float(record["ms"]))
+            elif record.get("kind") == "tokens":
+                self._add_tokens(record["agent"], {
+                    kind: value for kind, value in record.items()
+                    if kind in ("input", "output", "total") and isinstance(value, int)})
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())}
+            tokens: Dict[str, Dict[str, int]] = {}
+            for (agent, kind), value in sorted(self.tokens.items()):
+                tokens.setdefault(agent, {})[kind] = value
+            gauges = {family: dict(values) for family, values in sorted(self.gauges.items())}
+        return {"stages": stages, "tokens": tokens, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition of the stage histograms, percentiles and token counters."""
+        lines = [
+            "# HELP claims_stage_duration_ms Duration of chat turn and API stages.",
+            "# TYPE claims_stage_duration_ms histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            for stage, histogram in histograms:
+                stage = escape_label(stage)
+                for bound, count in zip(BUCKETS_MS, histogram.bucket_counts):
+                    lines.append(f'claims_stage_duration_ms_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'claims_stage_duration_ms_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'claims_stage_duration_ms_sum{{stage="{stage}"}} {histogram.sum_ms:.3f}')
+                lines.append(f'claims_stage_duration_ms_count{{stage="{stage}"}} {histogram.count}')
+            lines += [
+                f"# HELP claims_stage_recent_ms Percentiles over the last {PERCENTILE_WINDOW} samples per stage.",
+                "# TYPE claims_stage_recent_ms summary",
+            ]
+            for stage, histogram in histograms:
+                stage = escape_label(stage)
+                recent = sorted(histogram.recent)
+                for q in QUANTILES:
+                    lines.append(f'claims_stage_recent_ms{{stage="{stage}",quantile="{q}"}} {percentile(recent, q):.3f}')
+                lines.append(f'claims_stage_recent_ms_sum{{stage="{stage}"}} {sum(recent):.3f}')
+                lines.append(f'claims_stage_recent_ms_count{{stage="{stage}"}} {len(recent)}')
+            lines += [
+                "# HELP claims_llm_tokens_total LLM tokens used, by agent and kind.",
+                "# TYPE claims_llm_tokens_total counter",
+            ]
+            for (agent, kind), value in sorted(self.tokens.items()):
+                lines.append(f'claims_llm_tokens_total{{agent="{escape_label(agent)}",kind="{escape_label(kind)}"}} {value}')
+            for family, values in sorted(self.gauges.items()):
+                lines += [f"# HELP claims_{family} Current {family.replace('_', ' ')} state, by stat.",
+                          f"# TYPE claims_{family} gauge"]
+                for stat, value in sorted(values.items()):
+                    lines.append(f'claims_{family}{{stat="{escape_label(stat)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+_turn_ids = itertools.count(1)
+
+
+def new_turn_id() -> str:
+    return f"{os.getpid()}-{next(_turn_ids)}-{uuid.uuid4().hex[:6]}"
+
+
+def current_turn() -> Optional[TurnTrace]:
+    return _current_turn.get()
+
+
+@contextmanager
+def turn(turn_id: Optional[str] = None) -> Iterator[TurnTrace]:
+    """Attributes the spans of the enclosed block (and tasks/threads it starts) to one turn."""
+    trace = TurnTrace(turn_id or new_turn_id())
+    token = _current_turn.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_turn.reset(token)
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """Times the enclosed block as `stage`, as a logfire span and a histogram sample."""
+    started = time.perf_counter()
+    try:
+        with get_logfire().span(stage, **attributes):
+            yield
+    finally:
+        registry.observe(stage, 1000 * (time.perf_counter() - started), **attributes)
+
+
+def record_usage(agent: str, result: Any):
+    """Records the token usage of a pydantic-ai run result, if it reports any."""
+    try:
+        usage = result.usage()
+    except (AttributeError, TypeError):
+        return
+    # request/response_tokens on older pydantic-ai, input/output_tokens on newer releases
+    registry.record_tokens(agent, {
+        "input": getattr(usage, "input_tokens", None) or getattr(usage, "request_tokens", None) or 0,
+        "output": getattr(usage, "output_tokens", None) or getattr(usage, "response_tokens", None) or 0,
+        "total": getattr(usage, "total_tokens", None) or 0,
+    })
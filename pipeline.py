@@ -0,0 +1,468 @@
+# pipeline.py
+import asyncio
+import functools
+import httpx
+import json
+import os
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional, Protocol
+
+# Import necessary components
+from models import (
+    Claim, ClaimCreate, PartialClaim, HTTPValidationError,
+    Intent, SQLQuery, InvalidSQLRequest, SQLResponse
+)
+from extraction_agent import get_extraction_agent
+from synthesizer import get_faker, synthesize_claim
+from incident_catalog import get_matcher
+from db_utils import RESULT_PAGE_SIZE, count_rows_async, run_page_async
+from intent_agent import get_intent_agent
+from intent_classifier import get_intent_classifier
+from sql_agent import get_sql_agent
+from sql_cache import sql_query_cache
+from query_builder import build_structured_query
+import speculation
+import http_clients
+import metrics
+from llm_gateway import gateway, is_rate_limited
+from pydantic import ValidationError as PydanticValidationError, TypeAdapter
+from pydantic_core import from_json
+
+# --- Configuration ---
+API_BASE_URL = http_clients.CLAIMS_API_URL  # Your running API URL
+
+# Stream partial agent output into the status panel as it arrives
+STREAMING_ENABLED = os.getenv("CLAIMS_STREAM_AGENTS", "1") == "1"
+STREAM_DEBOUNCE_SECONDS = 0.1
+
+
+@functools.lru_cache(maxsize=None)
+def get_sql_response_adapter() -> TypeAdapter:
+    return TypeAdapter(SQLResponse)
+
+
+def warm_up():
+    """Builds the agents and other lazily created resources ahead of the first turn."""
+    get_intent_classifier()
+    get_intent_agent()
+    get_extraction_agent()
+    get_sql_agent()
+    get_sql_response_adapter()
+    get_faker()
+    get_matcher()
+
+
+class StatusSink(Protocol):
+    """The subset of Streamlit's st.status container a turn reports progress to."""
+
+    def write(self, text: str) -> None: ...
+
+    def stream(self, key: str, text: str) -> None:
+        """Replaces the text of the live line `key` (partial agent output)."""
+
+    def update(self, *, label: Optional[str] = None, state: Optional[str] = None,
+               expanded: Optional[bool] = None) -> None: ...
+
+
+class NullStatus:
+    """Discards turn progress, for headless callers that only read the returned message."""
+
+    def write(self, text: str) -> None:
+        pass
+
+    def stream(self, key: str, text: str) -> None:
+        pass
+
+    def update(self, *, label: Optional[str] = None, state: Optional[str] = None,
+               expanded: Optional[bool] = None) -> None:
+        pass
+
+
+class TurnTiming:
+    """Turn wall time and time to first useful output (first partial agent output)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_output_ms: Optional[float] = None
+
+    def mark_first_output(self):
+        if self.first_output_ms is None:
+            self.first_output_ms = 1000 * (time.perf_counter() - self.started)
+
+    def finish(self) -> Dict[str, Any]:
+        """Records the turn's totals and returns them with its per-stage breakdown."""
+        total_ms = 1000 * (time.perf_counter() - self.started)
+        # Turns without streamed output show their result only at the end
+        first_output_ms = self.first_output_ms if self.first_output_ms is not None else total_ms
+        metrics.get_logfire().info("Turn finished in {total_ms:.0f} ms, first output after {first_output_ms:.0f} ms",
+                                   total_ms=total_ms, first_output_ms=first_output_ms)
+        metrics.registry.observe("turn", total_ms)
+        metrics.registry.observe("first_output", first_output_ms)
+        timings: Dict[str, Any] = {"first_output_ms": round(first_output_ms, 1), "total_ms": round(total_ms, 1)}
+        trace = metrics.current_turn()
+        if trace is not None:
+            timings["turn_id"] = trace.turn_id
+            timings["stages"] = {stage: round(ms, 1) for stage, ms in trace.stages.items()
+                                 if stage not in ("turn", "first_output")}
+            timings["tokens"] = dict(trace.tokens)
+        return timings
+
+
+def _parse_partial(partial: Any) -> Any:
+    """The agents stream their JSON answer as text; parses the part received so far."""
+    if not isinstance(partial, str):
+        return partial
+    try:
+        return from_json(partial, allow_partial="trailing-strings")
+    except ValueError:
+        return None
+
+
+def render_partial_claim(partial: Any) -> Optional[str]:
+    partial = _parse_partial(partial)
+    if isinstance(partial, dict):
+        try:
+            partial = PartialClaim.model_validate(partial)
+        except PydanticValidationError:
+            return None  # e.g. a half-received date; the next chunk completes it
+    if not isinstance(partial, PartialClaim):
+        return None
+    fields = partial.model_dump(exclude_none=True, mode="json")
+    return f"📝 Extracting: {fields}" if fields else None
+
+
+def render_partial_sql(partial: Any) -> Optional[str]:
+    partial = _parse_partial(partial)
+    if isinstance(partial, dict):
+        # Not validated: SQLQuery rejects a partial "SEL..."
+        if isinstance(partial.get("sql"), str) and partial["sql"]:
+            return f"📊 Drafting SQL: `{partial['sql']}`"
+        if isinstance(partial.get("error_message"), str) and partial["error_message"]:
+            return f"⚠️ {partial['error_message']}"
+        return None
+    if isinstance(partial, SQLQuery) and partial.sql:
+        return f"📊 Drafting SQL: `{partial.sql}`"
+    if isinstance(partial, InvalidSQLRequest) and partial.error_message:
+        return f"⚠️ {partial.error_message}"
+    return None
+
+
+async def stream_agent_output(agent, user_prompt: str, status: StatusSink, key: str,
+                              render: Callable[[Any], Optional[str]], timing: TurnTiming) -> Any:
+    """Runs an agent with streamed output, rendering partials into `status`.
+
+    The stream holds an llm_gateway slot; if it is rate limited, the call is
+    repeated unstreamed through the gateway, which waits and retries.
+    """
+    try:
+        async with gateway.slot(f"{key}_agent", user_prompt) as slot:
+            async with agent.run_stream(user_prompt) as result:
+                # stream_output/get_output on newer pydantic-ai, stream/get_data on older releases
+                stream = getattr(result, "stream_output", None) or result.stream
+                async for partial in stream(debounce_by=STREAM_DEBOUNCE_SECONDS):
+                    text = render(partial)
+                    if text:
+                        timing.mark_first_output()
+                        status.stream(key, text)
+                get_output = getattr(result, "get_output", None) or result.get_data
+                output = await get_output()
+            slot.record_usage(result)
+    except Exception as e:
+        if not is_rate_limited(e):
+            raise
+        status.write("⏳ The language model is busy; waiting for capacity...")
+        return (await gateway.run(agent, user_prompt, f"{key}_agent")).data
+    return output
+
+
+async def run_turn(user_prompt: str, status: StatusSink) -> Dict[str, Any]:
+    """Runs one chat turn (intent, then create or retrieve) without touching the UI.
+
+    Progress goes to `status`; the returned assistant message dict holds the
+    content, intent and per-branch details the chat history renders, and
+    `timings` with the turn's per-stage breakdown (see metrics.py).
+    """
+    with metrics.turn():
+        return await _run_turn(user_prompt, status)
+
+
+async def _run_turn(user_prompt: str, status: StatusSink) -> Dict[str, Any]:
+    intent_info: Optional[Intent] = None
+    sql_response: Optional[SQLResponse] = None
+    extracted_data: Optional[PartialClaim] = None
+    extracted_data_dict = None
+    full_payload: Optional[ClaimCreate] = None
+    full_payload_dict = None
+    api_response_dict = None
+    error_message = None
+    final_content = "Processing..."
+
+    speculative: Dict[str, speculation.SpeculativeTask] = {}
+    intent_resolved_at = time.perf_counter()
+
+    timing = TurnTiming()
+
+    message: Dict[str, Any] = {"role": "assistant",
+                               "content": final_content, "intent": None}
+
+    try:
+        # 1. Detect Intent
+        status.write("🤔 Determining your intent...")
+        with metrics.span("intent_classifier"):
+            classification = get_intent_classifier().classify(user_prompt)
+        if classification.confident:
+            intent_info = classification.intent
+            status.write(
+                f"⚡ Intent resolved locally ({classification.source}, confidence {classification.confidence:.2f}).")
+        else:
+            if speculation.SPECULATION_ENABLED:
+                # Run the likely next step alongside intent detection
+                speculative["extraction"] = speculation.start(
+                    "extraction", gateway.run(get_extraction_agent(), user_prompt, "extraction_agent"))
+                if classification.intent and classification.intent.action == "retrieve":
+                    speculative["sql"] = speculation.start(
+                        "sql", gateway.run(get_sql_agent(), user_prompt, "sql_agent"))
+            with metrics.span("intent_agent"):
+                intent_result = await gateway.run(get_intent_agent(), user_prompt, "intent_agent")
+            intent_resolved_at = time.perf_counter()
+            raw_intent_output = intent_result.data
+            if isinstance(raw_intent_output, str):
+                intent_info = Intent.model_validate_json(raw_intent_output)
+            elif isinstance(raw_intent_output, dict):
+                intent_info = Intent.model_validate(raw_intent_output)
+            elif isinstance(raw_intent_output, Intent):
+                intent_info = raw_intent_output
+            else:
+                raise TypeError(
+                    f"Unexpected intent output type: {type(raw_intent_output)}")
+            get_intent_classifier().record_llm_result(
+                user_prompt, classification, intent_info)
+
+        # Cancel the speculative run the detected intent does not need
+        for name, needed_by in (("extraction", "create"), ("sql", "retrieve")):
+            if name in speculative and intent_info.action != needed_by:
+                speculation.discard(speculative.pop(name))
+
+        # Store intent
+        message["intent"] = intent_info.action
+        status.write(f"✅ Intent detected: **{intent_info.action}**")
+        # (Rest of intent processing...)
+
+        # --- Branch based on Intent ---
+        if intent_info.action == "create":
+            status.update(label="Processing claim creation...")
+            # 1a. Extract
+            status.write("🧠 Extracting claim details...")
+            with metrics.span("extraction"):
+                if "extraction" in speculative:
+                    extraction_result = await speculation.consume(
+                        speculative.pop("extraction"), intent_resolved_at)
+                    raw_extract_output = extraction_result.data
+                elif STREAMING_ENABLED:
+                    raw_extract_output = await stream_agent_output(
+                        get_extraction_agent(), user_prompt, status, "extraction", render_partial_claim, timing)
+                else:
+                    extraction_result = await gateway.run(get_extraction_agent(), user_prompt, "extraction_agent")
+                    raw_extract_output = extraction_result.data
+            if isinstance(raw_extract_output, str):
+                extracted_data = PartialClaim.model_validate_json(
+                    raw_extract_output)
+            elif isinstance(raw_extract_output, PartialClaim):
+                extracted_data = raw_extract_output
+            else:
+                raise TypeError(
+                    f"Unexpected extraction output type: {type(raw_extract_output)}")
+
+            extracted_data_dict = extracted_data.model_dump(
+                exclude_none=True)
+            status.write(
+                f"📝 Extracted Info: {extracted_data_dict or 'None'}")
+            # Store for display
+            message["extracted_info"] = extracted_data_dict
+
+            # 1b. Synthesize
+            status.write("⚙️ Generating test data...")
+            with metrics.span("synthesis"):
+                full_payload = synthesize_claim(extracted_data)
+            full_payload_dict = full_payload.model_dump(mode='json')
+            status.write(
+                f"✅ Generated Full Payload: {full_payload_dict}")
+            # Store for display
+            message["payload"] = full_payload_dict
+
+            # 1c. Post to API
+            status.write(
+                f"📤 Submitting claim via API to {API_BASE_URL}...")
+            client = http_clients.get_client(API_BASE_URL)
+            with metrics.span("api_post"):
+                response = await http_clients.request(
+                    client, "POST", "/claims/", json=full_payload_dict)
+            if response.status_code == 422:
+                validation_error = HTTPValidationError(
+                    **response.json())
+                error_detail = validation_error.model_dump_json(
+                    indent=2)
+                raise httpx.HTTPStatusError(
+                    f"API Validation Error (422): {error_detail}", request=response.request, response=response)
+            response.raise_for_status()
+            api_response_dict = response.json()
+            status.write(
+                f"✔️ Claim submitted successfully via API! Response: {api_response_dict}")
+            # Store for display
+            message["response"] = api_response_dict
+
+            response_claim = Claim(**api_response_dict)
+            final_content = f"Test claim created successfully via API! Claim ID: `{response_claim.id}`."
+
+        elif intent_info.action == "retrieve":
+            status.update(label="Processing claim retrieval...")
+            if not intent_info.query_details:
+                final_content = "Okay, you want to find some claims. Can you be more specific? For example, tell me a claim ID, policy holder name, or status."
+                status.update(label="Need more info",
+                              state="complete", expanded=False)
+                return message
+
+            # 2a. Build SQL: direct lookup, cached translation, or sql_agent
+            with metrics.span("sql_generation"):
+                sql_params: tuple = ()
+                sql_source = "agent"
+                structured_query = build_structured_query(
+                    intent_info.query_details)
+                if structured_query:
+                    sql_source = "direct"
+                    sql_response = SQLQuery(
+                        sql=structured_query.sql, explanation=structured_query.explanation)
+                    sql_params = structured_query.params
+                    status.write(
+                        "⚡ Built a direct lookup query (no SQL generation needed).")
+                else:
+                    sql_response = sql_query_cache.lookup(
+                        intent_info.query_details)
+                    if sql_response is not None:
+                        sql_source = "cache"
+                        status.write("⚡ Reusing a cached SQL translation.")
+                    else:
+                        status.write(
+                            f"✍️ Generating SQL query for: '{intent_info.query_details}'...")
+                        if "sql" in speculative:
+                            # Speculative SQL was generated from the full prompt,
+                            # so it is not cached under query_details
+                            sql_source = "speculative"
+                            sql_agent_result = await speculation.consume(
+                                speculative.pop("sql"), intent_resolved_at)
+                            raw_sql_output = sql_agent_result.data
+                        elif STREAMING_ENABLED:
+                            raw_sql_output = await stream_agent_output(
+                                get_sql_agent(), intent_info.query_details, status, "sql", render_partial_sql, timing)
+                        else:
+                            sql_agent_result = await gateway.run(
+                                get_sql_agent(), intent_info.query_details, "sql_agent")
+                            raw_sql_output = sql_agent_result.data
+                        try:
+                            if isinstance(raw_sql_output, str):
+                                sql_response = get_sql_response_adapter().validate_json(
+                                    raw_sql_output)
+                            elif isinstance(raw_sql_output, dict):
+                                sql_response = get_sql_response_adapter().validate_python(
+                                    raw_sql_output)
+                            elif isinstance(raw_sql_output, (SQLQuery, InvalidSQLRequest)):
+                                sql_response = raw_sql_output
+                            else:
+                                raise TypeError(
+                                    f"Unexpected SQL agent output type: {type(raw_sql_output)}")
+                        except (PydanticValidationError, json.JSONDecodeError) as parse_error:
+                            raise TypeError(
+                                "SQL agent returned output that could not be parsed into SQLQuery or InvalidSQLRequest.") from parse_error
+
+            if isinstance(sql_response, InvalidSQLRequest):
+                status.update(label="SQL Generation Failed",
+                              state="error", expanded=True)
+                final_content = f"Sorry, I couldn't generate a query for that request: {sql_response.error_message}"
+                error_message = final_content  # Store as error
+            elif isinstance(sql_response, SQLQuery):
+                status.write(f"📊 Generated SQL: `{sql_response.sql}`")
+                # Store for display
+                message["sql_query"] = sql_response.sql
+                if sql_params:
+                    message["sql_query"] += f"\n-- parameters: {list(sql_params)}"
+
+                # 2b. Validate (EXPLAIN) and fetch the first page, counting all matches alongside
+                status.write(
+                    "🛡️ Validating and executing query against local database...")
+                with metrics.span("sql_query"):
+                    query_result, (total_rows, count_error) = await asyncio.gather(
+                        # Columnar, like the UI's page fetches, so they hit the result cache
+                        run_page_async(sql_response.sql, sql_params, columnar=True),
+                        count_rows_async(sql_response.sql, sql_params))
+                if query_result.explain_error:
+                    status.update(label="SQL Validation Failed",
+                                  state="error", expanded=True)
+                    final_content = f"I generated an SQL query, but it failed validation: {query_result.explain_error}. Please try rephrasing your request."
+                    error_message = final_content  # Store as error
+                else:
+                    status.write(
+                        f"✅ SQL validation passed (EXPLAIN OK). Plan: {query_result.plan}")
+                    # Store the query, not its rows; the UI fetches pages on demand
+                    message["result_query"] = {
+                        "sql": sql_response.sql, "params": list(sql_params)}
+                    message["result_count"] = total_rows
+
+                    if query_result.error:
+                        status.update(
+                            label="SQL Execution Failed", state="error", expanded=True)
+                        final_content = f"I generated a valid query, but it failed to execute: {query_result.error}"
+                        error_message = final_content  # Store as error
+                    else:
+                        if count_error:
+                            metrics.get_logfire().warn("Counting result rows failed", sql=sql_response.sql,
+                                                       error=count_error)
+                            status.write(
+                                f"✅ Fetched the first page in {query_result.elapsed_ms:.0f} ms (total count unavailable).")
+                            final_content = f"Okay, I found claims matching your request; they are shown {RESULT_PAGE_SIZE} per page below."
+                        else:
+                            status.write(
+                                f"✅ Found {total_rows} matching claim(s); first page in {query_result.elapsed_ms:.0f} ms"
+                                + (" (cached)." if query_result.cached else "."))
+                            final_content = f"Okay, I found {total_rows} claim(s) matching your request. See the results below."
+                        if sql_response.explanation:
+                            final_content += f"\n\nQuery Explanation: {sql_response.explanation}"
+                        if sql_source == "agent":
+                            # Only cache translations of query_details that executed successfully
+                            sql_query_cache.store(
+                                intent_info.query_details, sql_response)
+        else:  # Intent is 'unknown'
+            status.update(label="Request unclear",
+                          state="complete", expanded=False)
+            final_content = "I'm not sure how to help with that. I can create test claims or retrieve existing ones. Could you please clarify your request?"
+
+        # Update status to complete if no error occurred earlier
+        if not error_message:
+            status.update(label="Processing Complete",
+                          state="complete", expanded=False)
+
+    except httpx.HTTPStatusError as e:
+        error_message = f"API Error during claim creation: {e}"
+        final_content = "Sorry, there was an error submitting the claim to the API."
+        status.update(label="API Error", state="error", expanded=True)
+    except Exception as e:
+        error_message = f"An unexpected error occurred: {e}"
+        # Keep print for unexpected errors
+        print(f"*** Unexpected Error: {error_message}")
+        print(traceback.format_exc())  # Keep print for unexpected errors
+        final_content = "Sorry, an unexpected error occurred while processing your request."
+        status.update(label="Unexpected Error",
+                      state="error", expanded=True)
+
+    finally:
+        # Cancel speculative runs the detected intent did not need
+        for spec in speculative.values():
+            speculation.discard(spec)
+
+        # Update the final content and error state in the message dictionary
+        message["content"] = final_content
+        if error_message:
+            message["error"] = error_message
+        message["timings"] = timing.finish()
+
+    return message
@@ -0,0 +1,82 @@
+# query_builder.py
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from synthesizer import COMPANY_OFFICES, STATUSES
+
+CLAIM_ID_PATTERN = re.compile(r"\bCLM-\d{10}\b", re.IGNORECASE)
+POLICY_NUMBER_PATTERN = re.compile(r"\bPOL-\d{6,8}\b", re.IGNORECASE)
+
+# Phrases users say for a status, mapped to the stored value
+STATUS_ALIASES: Dict[str, str] = {status.lower(): status for status in STATUSES}
+STATUS_ALIASES.update({"in progress": "Repair in Progress", "in repair": "Repair in Progress"})
+COMPANY_NAMES: Dict[str, str] = {company.lower(): company for company in COMPANY_OFFICES}
+
+# Longest phrases first so "repair in progress" wins over "in progress"
+_PHRASES = sorted(list(STATUS_ALIASES) + list(COMPANY_NAMES), key=len, reverse=True)
+PHRASE_PATTERN = re.compile(r"\b(" + "|".join(re.escape(p) for p in _PHRASES) + r")\b", re.IGNORECASE)
+
+# Words that carry no filter; anything else left over means the request has
+# conditions this builder cannot express, and sql_agent must handle it.
+FILLER_WORDS = {
+    "a", "all", "and", "any", "are", "by", "can", "claim", "claims", "company", "details",
+    "find", "for", "from", "get", "id", "ids", "in", "is", "list", "lookup", "look", "me",
+    "my", "number", "numbers", "of", "please", "policy", "show", "status", "statuses",
+    "that", "the", "up", "what", "whats", "what's", "which", "with", "you",
+}
+WORD_PATTERN = re.compile(r"[a-z']+|\d+")
+
+
+@dataclass
+class StructuredQuery:
+    """A parameterized SELECT built without sql_agent."""
+    sql: str
+    params: Tuple[Any, ...]
+    explanation: str
+
+
+def _in_clause(column: str, values: List[str]) -> str:
+    if len(values) == 1:
+        return f"{column} = ?"
+    return f"{column} IN ({', '.join('?' * len(values))})"
+
+
+def build_structured_query(query_details: str) -> Optional[StructuredQuery]:
+    """Builds a lookup on claim ids, policy numbers, statuses and companies.
+
+    Returns None when query_details contains anything else, so the caller can
+    fall back to sql_agent.
+    """
+    claim_ids = list(dict.fromkeys(m.upper() for m in CLAIM_ID_PATTERN.findall(query_details)))
+    policy_numbers = list(dict.fromkeys(m.upper() for m in POLICY_NUMBER_PATTERN.findall(query_details)))
+    statuses: List[str] = []
+    companies: List[str] = []
+    for phrase in PHRASE_PATTERN.findall(query_details):
+        phrase = phrase.lower()
+        if phrase in COMPANY_NAMES and COMPANY_NAMES[phrase] not in companies:
+            companies.append(COMPANY_NAMES[phrase])
+        elif phrase in STATUS_ALIASES and STATUS_ALIASES[phrase] not in statuses:
+            statuses.append(STATUS_ALIASES[phrase])
+    if not (claim_ids or policy_numbers or statuses or companies):
+        return None
+
+    remainder = POLICY_NUMBER_PATTERN.sub(" ", CLAIM_ID_PATTERN.sub(" ", query_details))
+    remainder = PHRASE_PATTERN.sub(" ", remainder).lower()
+    if any(word not in FILLER_WORDS for word in WORD_PATTERN.findall(remainder)):
+        return None
+
+    conditions: List[str] = []
+    params: List[str] = []
+    described: List[str] = []
+    for column, values, label in (
+            ("id", claim_ids, "claim ID"), ("policy_number", policy_numbers, "policy number"),
+            ("status", statuses, "status"), ("company", companies, "company")):
+        if values:
+            conditions.append(_in_clause(column, values))
+            params.extend(values)
+            described.append(f"{label} {' or '.join(values)}")
+
+    sql = f"SELECT * FROM claims WHERE {' AND '.join(conditions)};"
+    explanation = f"Direct lookup of claims with {' and '.join(described)}."
+    return StructuredQuery(sql=sql, params=tuple(params), explanation=explanation)
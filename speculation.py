@@ -0,0 +1,94 @@
+# speculation.py
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Optional
+
+# Start extraction (and SQL generation on retrieval hints) while intent_agent runs
+SPECULATION_ENABLED = os.getenv("CLAIMS_SPECULATIVE_PIPELINE", "0") == "1"
+
+
+@dataclass
+class SpeculativeTask:
+    name: str
+    task: "asyncio.Task[Any]"
+    started: float
+    finished: Optional[float] = None
+
+
+class SpeculationStats:
+    """Time saved by consumed speculative runs versus work thrown away."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.used = 0
+        self.discarded = 0
+        self.cancelled_in_flight = 0  # Token usage of these is unknown
+        self.seconds_saved = 0.0
+        self.tokens_wasted = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "launched": self.launched,
+                "used": self.used,
+                "discarded": self.discarded,
+                "cancelled_in_flight": self.cancelled_in_flight,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "avg_ms_saved_per_use": 1000 * self.seconds_saved / self.used if self.used else 0.0,
+                "tokens_wasted": self.tokens_wasted,
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+def _total_tokens(result: Any) -> int:
+    try:
+        return result.usage().total_tokens or 0
+    except (AttributeError, TypeError):
+        return 0
+
+
+def start(name: str, coro: Awaitable[Any]) -> SpeculativeTask:
+    """Starts an agent run before it is known to be needed."""
+    spec = SpeculativeTask(name=name, task=asyncio.ensure_future(coro), started=time.perf_counter())
+
+    def mark_finished(_):
+        spec.finished = time.perf_counter()
+
+    spec.task.add_done_callback(mark_finished)
+    with speculation_stats._lock:
+        speculation_stats.launched += 1
+    return spec
+
+
+async def consume(spec: SpeculativeTask, needed_at: float) -> Any:
+    """Awaits a speculative run that turned out to be needed.
+
+    The time saved is how long it ran before `needed_at` (a perf_counter
+    timestamp), i.e. the latency the sequential pipeline would have added.
+    """
+    result = await spec.task
+    overlap_end = min(needed_at, spec.finished or needed_at)
+    with speculation_stats._lock:
+        speculation_stats.used += 1
+        speculation_stats.seconds_saved += max(0.0, overlap_end - spec.started)
+    return result
+
+
+def discard(spec: SpeculativeTask):
+    """Cancels a speculative run that lost, counting the tokens it already spent."""
+    with speculation_stats._lock:
+        speculation_stats.discarded += 1
+        if not spec.task.done():
+            speculation_stats.cancelled_in_flight += 1
+        elif not spec.task.cancelled() and spec.task.exception() is None:
+            speculation_stats.tokens_wasted += _total_tokens(spec.task.result())
+    if not spec.task.done():
+        spec.task.cancel()
+    elif not spec.task.cancelled():
+        spec.task.exception()  # Mark a failed speculative run's exception as retrieved
@@ -1,9 +1,8 @@
 # sql_agent.py
-from pydantic_ai import Agent, RunContext, ModelRetry, format_as_xml
+import functools
 from models import SQLResponse, SQLQuery, InvalidSQLRequest  # Import response models
-from db_utils import DB_SCHEMA  # Import DB schema
-import os
-from typing import Union
+from db_utils import DB_QUERY_SCHEMA  # Import DB schema
+from metrics import get_logfire
 
 GPT4_MODEL = "openai:gpt-4.1-nano"
 
@@ -13,17 +12,13 @@ class SQLAgentDeps:
 
 
 # Use a model good at code/SQL generation
-sql_agent = Agent[None, SQLResponse](  # No explicit Deps needed for now
-    # GPT-4o is good for this
-    model=GPT4_MODEL,
-    deps_type=None,  # No deps passed during run
-    system_prompt=f"""
+SQL_SYSTEM_PROMPT = f"""
     You are an expert SQLite query generator. Your task is to create a SQLite SELECT query 
     based on the user's request to retrieve information from the 'claims' table.
 
     **Database Schema:**
     ```sql
-    {DB_SCHEMA}
+    {DB_QUERY_SCHEMA}
     Use code with caution.
     Python
     Important Notes:
@@ -32,6 +27,11 @@ sql_agent = Agent[None, SQLResponse](  # No explicit Deps needed for now
     Use standard SQLite syntax. Pay attention to column names and types.
     The id column is the primary key (TEXT).
     incident_date is stored as DATETIME (ISO 8601 format string). Use functions like date(), datetime(), strftime() for date comparisons if needed. E.g., WHERE date(incident_date) = '2025-01-15'.
+    claims_fts is a full-text index over incident_description, policy_holder_name and point_of_impact (its rowid is claims.rowid).
+    For words or phrases in those columns (e.g. "hail", "a deer", "windshield"), do NOT use LIKE '%...%', which scans the whole table.
+    Join claims_fts and filter with MATCH instead, ranked with bm25 (lower is a better match):
+    SELECT claims.* FROM claims JOIN claims_fts ON claims_fts.rowid = claims.rowid WHERE claims_fts MATCH 'deer' ORDER BY bm25(claims_fts);
+    Always write the table name claims_fts (not an alias) in MATCH and bm25(). Restrict to one column with a column filter (MATCH 'point_of_impact : windshield'), match a phrase with double quotes (MATCH '"rear bumper"'), and prefixes with * (MATCH 'hydroplan*').
     Filter based on the details provided in the user's request (query_details).
     If the request is too vague or lacks specifics to form a query, respond using the InvalidSQLRequest schema.
     If the request seems valid, respond using the SQLQuery schema. Include a brief explanation if helpful.
@@ -44,10 +44,26 @@ sql_agent = Agent[None, SQLResponse](  # No explicit Deps needed for now
     Output (SQLQuery): {{"sql": "SELECT * FROM claims WHERE status = 'Approved' AND company = 'Alpha Insurance';", "explanation": "Selects approved claims from Alpha Insurance."}}
     User Request (query_details): "claims that happened yesterday"
     Output (SQLQuery): {{"sql": "SELECT * FROM claims WHERE date(incident_date) = date('now', '-1 day');", "explanation": "Selects claims where the incident occurred yesterday."}}
+    User Request (query_details): "claims involving hail"
+    Output (SQLQuery): {{"sql": "SELECT claims.* FROM claims JOIN claims_fts ON claims_fts.rowid = claims.rowid WHERE claims_fts MATCH 'hail' ORDER BY bm25(claims_fts);", "explanation": "Full-text search for hail in the claim descriptions, best matches first."}}
+    User Request (query_details): "approved claims about a deer"
+    Output (SQLQuery): {{"sql": "SELECT claims.* FROM claims JOIN claims_fts ON claims_fts.rowid = claims.rowid WHERE claims_fts MATCH 'deer' AND claims.status = 'Approved' ORDER BY bm25(claims_fts);", "explanation": "Approved claims whose text mentions a deer, best matches first."}}
     User Request (query_details): "details about a claim"
     Output (InvalidSQLRequest): {{"error_message": "Please provide more specific details for the claim you want to retrieve, such as the claim ID or policy number."}}
     User Request (query_details): "delete claim 123"
     Output (InvalidSQLRequest): {{"error_message": "Sorry, I can only retrieve claim information. I cannot perform delete operations."}}
-    """,
-    instrument=True  # Optional
-)
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def get_sql_agent():
+    """Builds the SQL agent on first use; pydantic-ai is imported here, not at module import."""
+    from pydantic_ai import Agent
+    get_logfire()  # Agent traces (instrument=True) go through the configured logfire
+    return Agent[None, SQLResponse](  # No explicit Deps needed for now
+        # GPT-4o is good for this
+        model=GPT4_MODEL,
+        deps_type=None,  # No deps passed during run
+        system_prompt=SQL_SYSTEM_PROMPT,
+        instrument=True  # Optional
+    )
@@ -0,0 +1,237 @@
+# sql_cache.py
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError as PydanticValidationError
+
+from models import SQLQuery
+from synthesizer import COMPANY_OFFICES, STATUSES
+
+CACHE_ENABLED = os.getenv("CLAIMS_SQL_CACHE", "1") == "1"
+CACHE_FILE = os.getenv("CLAIMS_SQL_CACHE_FILE", "sql_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("CLAIMS_SQL_CACHE_MAX_ENTRIES", "1000"))
+CACHE_TTL_SECONDS = float(os.getenv("CLAIMS_SQL_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Literals parameterized out of query_details, in matching order. Known
+# statuses and companies match case-insensitively and bind their canonical
+# spelling, since that is what the generated SQL contains. They are separate
+# slot kinds, so a status template never re-binds a company (or vice versa).
+_STATUSES = sorted(STATUSES, key=len, reverse=True)
+_COMPANIES = sorted(COMPANY_OFFICES, key=len, reverse=True)
+_CANONICAL_VALUES = {value.lower(): value for value in _STATUSES + _COMPANIES}
+
+
+def _one_of(values: List[str]) -> str:
+    return r"(?i:\b(?:" + "|".join(re.escape(v) for v in values) + r")\b)"
+
+
+SLOT_PATTERN = re.compile(
+    r"(?P<claim_id>\bCLM-\d+\b)"
+    r"|(?P<policy>\bPOL-\d+\b)"
+    r"|(?P<date>\b\d{4}-\d{2}-\d{2}\b)"
+    r"|'(?P<single_quoted>[^']+)'|\"(?P<double_quoted>[^\"]+)\""
+    r"|(?P<status>" + _one_of(_STATUSES) + ")"
+    r"|(?P<company>" + _one_of(_COMPANIES) + ")"
+    r"|(?P<name>\b[A-Z][a-z]+(?: [A-Z][a-z']+)+\b)"
+    r"|(?P<number>\b\d+\b)")
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def _marker(index: int) -> str:
+    # Private-use code point, so it cannot collide with user text or digits
+    return chr(0xE000 + index)
+
+
+def normalize(query_details: str) -> str:
+    return " ".join(query_details.lower().split()).rstrip(" .?!")
+
+
+def extract_slots(query_details: str) -> Tuple[str, List[str]]:
+    """Replaces literals in query_details with typed placeholders.
+
+    Returns the normalized template key and the literal values in order; the
+    key names each slot's kind, so a template only matches questions with
+    the same kinds of literal in the same order.
+    """
+    values: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind in ("status", "company"):
+            value = _CANONICAL_VALUES[value.lower()]
+        values.append(value)
+        return f"<{kind}>"
+
+    template = SLOT_PATTERN.sub(replace, query_details)
+    return normalize(template), values
+
+
+def _templatize(text: str, values: List[str], literals_only: bool) -> Optional[str]:
+    """Replaces each value with a numbered marker, or returns None if one is missing."""
+    for index, value in enumerate(values):
+        marker = _marker(index)
+        if literals_only:
+            escaped = value.replace("'", "''")
+            found = False
+
+            def replace(match: re.Match) -> str:
+                nonlocal found
+                literal = match.group(0)
+                if escaped in literal:
+                    found = True
+                    return literal.replace(escaped, marker)
+                return literal
+
+            text = SQL_STRING_LITERAL.sub(replace, text)
+            if not found:
+                return None
+        else:
+            text = re.sub(re.escape(value), marker, text, flags=re.IGNORECASE)
+    return text
+
+
+def _bind(template: str, values: List[str], escape_quotes: bool) -> str:
+    for index, value in enumerate(values):
+        text = value.replace("'", "''") if escape_quotes else value
+        template = template.replace(_marker(index), text)
+    return template
+
+
+class SQLQueryCache:
+    """LRU + TTL cache of generated SQL in front of sql_agent.
+
+    Lookups try the exact normalized query_details first, then a template in
+    which ids, dates, names, statuses and companies are parameterized out and
+    re-bound into the cached SQL. Entries are persisted to a SQLite file.
+    """
+
+    def __init__(self, path: Optional[str] = CACHE_FILE, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # kind ("exact" | "template") -> key -> (sql, explanation, stored_at)
+        self._entries: Dict[str, "OrderedDict[str, Tuple[str, Optional[str], float]]"] = {
+            "exact": OrderedDict(), "template": OrderedDict()}
+        self.exact_hits = 0
+        self.template_hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self._load()
+
+    def _load(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sql_cache (kind TEXT, key TEXT, sql TEXT, "
+            "explanation TEXT, stored_at REAL, PRIMARY KEY (kind, key))")
+        self._conn.execute("DELETE FROM sql_cache WHERE stored_at < ?",
+                           (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT kind, key, sql, explanation, stored_at FROM sql_cache ORDER BY stored_at").fetchall()
+        for kind, key, sql, explanation, stored_at in rows:
+            if kind in self._entries:
+                self._put(kind, key, (sql, explanation, stored_at), persist=False)
+
+    def _put(self, kind: str, key: str, entry: Tuple[str, Optional[str], float], persist: bool = True):
+        entries = self._entries[kind]
+        entries[key] = entry
+        entries.move_to_end(key)
+        evicted = []
+        while len(entries) > self.max_entries:
+            evicted.append(entries.popitem(last=False)[0])
+        if persist and self._conn is not None:
+            self._conn.execute("INSERT OR REPLACE INTO sql_cache VALUES (?, ?, ?, ?, ?)",
+                               (kind, key, *entry))
+            self._conn.executemany("DELETE FROM sql_cache WHERE kind = ? AND key = ?",
+                                   [(kind, old_key) for old_key in evicted])
+            self._conn.commit()
+
+    def _get(self, kind: str, key: str) -> Optional[Tuple[str, Optional[str], float]]:
+        entries = self._entries[kind]
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[2] > self.ttl_seconds:
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry
+
+    def lookup(self, query_details: str) -> Optional[SQLQuery]:
+        """Returns a cached SQLQuery for query_details, re-validated, or None."""
+        if not CACHE_ENABLED:
+            return None
+        template_key, values = extract_slots(query_details)
+        with self._lock:
+            entry = self._get("exact", normalize(query_details))
+            kind = "exact"
+            if entry is None and values:
+                entry = self._get("template", template_key)
+                kind = "template"
+            if entry is None:
+                self.misses += 1
+                return None
+
+        sql, explanation, _ = entry
+        if kind == "template":
+            sql = _bind(sql, values, escape_quotes=True)
+            explanation = _bind(explanation, values, escape_quotes=False) if explanation else None
+        try:
+            # Goes through SQLQuery.ensure_select_statement like agent output
+            cached = SQLQuery(sql=sql, explanation=explanation)
+        except PydanticValidationError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            if kind == "exact":
+                self.exact_hits += 1
+            else:
+                self.template_hits += 1
+        return cached
+
+    def store(self, query_details: str, sql_query: SQLQuery):
+        if not CACHE_ENABLED:
+            return
+        template_key, values = extract_slots(query_details)
+        now = time.time()
+        with self._lock:
+            self._put("exact", normalize(query_details), (sql_query.sql, sql_query.explanation, now))
+            # Only cache a template if every literal can be re-bound inside a SQL string literal
+            template_sql = _templatize(sql_query.sql, values, literals_only=True) if values else None
+            if template_sql is not None:
+                template_explanation = (_templatize(sql_query.explanation, values, literals_only=False)
+                                        if sql_query.explanation else None)
+                self._put("template", template_key, (template_sql, template_explanation, now))
+
+    def clear(self):
+        with self._lock:
+            for entries in self._entries.values():
+                entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM sql_cache")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.exact_hits + self.template_hits + self.misses
+            return {
+                "exact_entries": len(self._entries["exact"]),
+                "template_entries": len(self._entries["template"]),
+                "exact_hits": self.exact_hits,
+                "template_hits": self.template_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.template_hits) / lookups if lookups else 0.0,
+            }
+
+
+sql_query_cache = SQLQueryCache()
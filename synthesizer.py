@@ -1,11 +1,24 @@
 # synthesizer.py
+from __future__ import annotations
+
+import functools
 import random
 from datetime import datetime, timedelta
-from faker import Faker
+from incident_catalog import INCIDENT_IMPACT_MAPPING, get_catalog, get_matcher
 from models import ClaimCreate, PartialClaim
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+# Faker and NumPy are slow to import; they are loaded by the functions that use them
+if TYPE_CHECKING:
+    import numpy as np
+    from faker import Faker
+
+
+@functools.lru_cache(maxsize=None)
+def get_faker() -> Faker:
+    from faker import Faker
+    return Faker()
 
-fake = Faker()
 
 ADJUSTER_NAMES = [
     "Ryan Cooper", "Olivia Harris", "Daniel Brooks", "Chloe Bennett",
@@ -33,42 +46,27 @@ DEFAULT_VEHICLES = [
     ("Tesla","Model 3", 2023), ("Subaru", "Outback", 2019)
 ]
 
-INCIDENT_IMPACT_MAPPING = [
-    ("Rear-ended at a traffic signal", "Rear bumper"),
-    ("Hit a parked car while reversing", "Rear bumper"),
-    ("Backed into a pole", "Rear bumper"),
-    ("Minor collision in parking lot, front impact", "Front bumper"),
-    ("Hit a deer crossing the road", "Front bumper"),
-    ("Collision with debris on highway", "Front bumper/Underbody"),
-    ("Side-swiped driver side while parked", "Driver side"),
-    ("T-boned on the driver side at intersection", "Driver side"),
-    ("Another car merged into driver side lane", "Driver side"),
-    ("Side-swiped passenger side", "Passenger side"),
-    ("Scraped passenger side against wall", "Passenger side"),
-    ("Object fell on roof", "Roof"),
-    ("Hail damage", "Roof/Hood/Trunk"),
-    ("Windshield cracked by rock from truck", "Windshield"),
-    ("Hit a pothole causing tire/wheel damage", "Wheel/Suspension"),
-    ("Skidded on ice and hit guardrail", "Front/Side"),
-    ("Hydroplaned into a ditch", "Underbody/Side"),
-    ("Vandalism - keyed along the side", "Driver side/Passenger side"),
-    ("Attempted theft, broken window", "Driver side window/Passenger side window"),
-    ("Fender bender in slow traffic", "Front bumper/Rear bumper")
-]
-
 DEFAULT_IMPACTS = list(set(item[1] for item in INCIDENT_IMPACT_MAPPING))
 
+INCIDENT_START_DATE = datetime(2025, 1, 1, 0, 0, 0)
+INCIDENT_END_DATE = datetime(2025, 3, 31, 23, 59, 59)
+
+# Batch synthesis draws names from a pool instead of calling Faker per row
+NAME_POOL_SIZE = 5000
+BATCH_CHUNK_SIZE = 100_000
+# synthesize_claims draws 8-digit policy numbers, room for 90M unique values
+BULK_POLICY_NUMBER_MIN = 10_000_000
+BULK_POLICY_NUMBER_MAX = 100_000_000
+
 
 def generate_policy_number() -> str:
     return f"POL-{random.randint(100000, 999999)}"
 
 
 def generate_incident_date() -> datetime:
-    start_date = datetime(2025, 1, 1, 0, 0, 0)
-    end_date = datetime(2025, 3, 31, 23, 59, 59)
-    delta = end_date - start_date
+    delta = INCIDENT_END_DATE - INCIDENT_START_DATE
     random_seconds = random.randint(0, int(delta.total_seconds()))
-    return start_date + timedelta(seconds=random_seconds)
+    return INCIDENT_START_DATE + timedelta(seconds=random_seconds)
 
 
 def generate_vehicle() -> tuple[str, str, int]:
@@ -76,13 +74,18 @@ def generate_vehicle() -> tuple[str, str, int]:
 
 
 def generate_incident_and_impact() -> tuple[str, str]:
-    return random.choice(INCIDENT_IMPACT_MAPPING)
+    return random.choice(get_catalog())
+
+
+def match_impact(description: str) -> Optional[str]:
+    """Returns the point of impact of the incident catalog entry closest to the description."""
+    return get_matcher().match(description)
 
 
 def synthesize_claim(partial_claim: PartialClaim) -> ClaimCreate:
     """Fills missing fields in a partial claim to create a complete ClaimCreate object."""
 
-    name = partial_claim.policy_holder_name or fake.name()
+    name = partial_claim.policy_holder_name or get_faker().name()
     policy_num = partial_claim.policy_number or generate_policy_number()
     make, model, year = generate_vehicle()
     vehicle_make = partial_claim.vehicle_make or make
@@ -104,15 +107,8 @@ def synthesize_claim(partial_claim: PartialClaim) -> ClaimCreate:
         if extracted_impact:
             impact = extracted_impact
         else:
-            # Try to match extracted description to get impact
-            matched = False
-            for desc_map, impact_map in INCIDENT_IMPACT_MAPPING:
-                if desc_map.lower() in inc_desc.lower() or inc_desc.lower() in desc_map.lower():
-                    impact = impact_map
-                    matched = True
-                    break
-            if not matched:
-                impact = random.choice(DEFAULT_IMPACTS)  # Fallback if no match
+            # Try to match extracted description to get impact, fallback if no match
+            impact = match_impact(inc_desc) or random.choice(DEFAULT_IMPACTS)
     else:
         # If no description extracted, generate both description and a matching impact
         generated_desc, generated_impact = generate_incident_and_impact()
@@ -159,3 +155,139 @@ def synthesize_claim(partial_claim: PartialClaim) -> ClaimCreate:
         company=company, claim_office=office, point_of_impact=impact,  # Use finalized impact
     )
     return full_claim
+
+
+# --- Batch Synthesis ---
+
+def _choice(rng: np.random.Generator, values, size: int, fixed=None) -> np.ndarray:
+    """Draws a column from values, or broadcasts the fixed value when given."""
+    import numpy as np
+    if fixed:
+        return np.full(size, fixed)
+    return np.asarray(values)[rng.integers(len(values), size=size)]
+
+
+def _name_pool(seed: Optional[int]) -> np.ndarray:
+    from faker import Faker
+    import numpy as np
+    pool_faker = Faker()
+    pool_faker.seed_instance(seed)
+    return np.array([pool_faker.name() for _ in range(NAME_POOL_SIZE)])
+
+
+@functools.lru_cache(maxsize=None)
+def _catalog_columns() -> tuple[np.ndarray, np.ndarray]:
+    """The incident catalog as description and impact arrays, built once per process."""
+    import numpy as np
+    catalog = get_catalog()
+    return (np.array([description for description, _ in catalog]),
+            np.array([impact for _, impact in catalog]))
+
+
+def _company_offices(rng: np.random.Generator, size: int, company: Optional[str],
+                     office: Optional[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Column-wise equivalent of the company/office rules in synthesize_claim."""
+    import numpy as np
+    if company in COMPANY_OFFICES:
+        offices = COMPANY_OFFICES[company]
+        return np.full(size, company), _choice(rng, offices, size, office if office in offices else None)
+    if company is None and office is not None:
+        for comp, offices in COMPANY_OFFICES.items():
+            if office in offices:
+                return np.full(size, comp), np.full(size, office)
+
+    # Unknown company or office: draw a company, then an office belonging to it
+    companies = list(COMPANY_OFFICES.keys())
+    office_table = [COMPANY_OFFICES[comp] for comp in companies]
+    counts = np.array([len(offices) for offices in office_table])
+    width = counts.max()
+    padded = np.array([offices + [""] * (width - len(offices)) for offices in office_table])
+
+    company_idx = rng.integers(len(companies), size=size)
+    office_idx = (rng.random(size) * counts[company_idx]).astype(np.int64)
+    return np.asarray(companies)[company_idx], padded[company_idx, office_idx]
+
+
+def synthesize_claims(n: int, partial: Optional[PartialClaim] = None, seed: Optional[int] = None,
+                      chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Dict[str, np.ndarray]]:
+    """Synthesizes n claims column-wise, yielding dict-of-arrays chunks.
+
+    Fields set on `partial` are broadcast to every row; the rest are drawn
+    with NumPy from the same pools as synthesize_claim. No ClaimCreate
+    objects are built, so values are not validated per row. Policy numbers
+    are a consecutive run from a random start, so they are unique per call.
+    """
+    import numpy as np
+    partial = partial or PartialClaim()
+    rng = np.random.default_rng(seed)
+    if not partial.policy_number:
+        if n > BULK_POLICY_NUMBER_MAX - BULK_POLICY_NUMBER_MIN:
+            raise ValueError(f"Cannot synthesize {n} unique policy numbers")
+        first_policy_number = int(rng.integers(BULK_POLICY_NUMBER_MIN, BULK_POLICY_NUMBER_MAX - n + 1))
+    name_pool = None if partial.policy_holder_name else _name_pool(seed)
+
+    makes = [vehicle[0] for vehicle in DEFAULT_VEHICLES]
+    models_ = [vehicle[1] for vehicle in DEFAULT_VEHICLES]
+    years = np.array([vehicle[2] for vehicle in DEFAULT_VEHICLES])
+    descriptions, impacts = _catalog_columns()
+    start = np.datetime64(INCIDENT_START_DATE, "s")
+    span_seconds = int((INCIDENT_END_DATE - INCIDENT_START_DATE).total_seconds())
+
+    # A fixed description maps to one impact (or the random fallback), once
+    fixed_desc_impact = None
+    if partial.incident_description and not partial.point_of_impact:
+        fixed_desc_impact = match_impact(partial.incident_description)
+
+    for offset in range(0, n, chunk_size):
+        size = min(chunk_size, n - offset)
+        batch: Dict[str, np.ndarray] = {}
+
+        batch["policy_holder_name"] = _choice(rng, name_pool, size, partial.policy_holder_name)
+        if partial.policy_number:
+            batch["policy_number"] = np.full(size, partial.policy_number)
+        else:
+            numbers = np.arange(first_policy_number + offset, first_policy_number + offset + size).astype(str)
+            batch["policy_number"] = np.char.add("POL-", numbers)
+
+        vehicle_idx = rng.integers(len(DEFAULT_VEHICLES), size=size)
+        batch["vehicle_make"] = (np.full(size, partial.vehicle_make) if partial.vehicle_make
+                                 else np.asarray(makes)[vehicle_idx])
+        batch["vehicle_model"] = (np.full(size, partial.vehicle_model) if partial.vehicle_model
+                                  else np.asarray(models_)[vehicle_idx])
+        batch["vehicle_year"] = (np.full(size, partial.vehicle_year) if partial.vehicle_year
+                                 else years[vehicle_idx])
+
+        if partial.incident_date:
+            batch["incident_date"] = np.full(size, np.datetime64(partial.incident_date, "s"))
+        else:
+            seconds = rng.integers(0, span_seconds + 1, size=size)
+            batch["incident_date"] = start + seconds.astype("timedelta64[s]")
+
+        if partial.incident_description:
+            batch["incident_description"] = np.full(size, partial.incident_description)
+            if partial.point_of_impact:
+                batch["point_of_impact"] = np.full(size, partial.point_of_impact)
+            else:
+                batch["point_of_impact"] = _choice(rng, DEFAULT_IMPACTS, size, fixed_desc_impact)
+        else:
+            incident_idx = rng.integers(len(descriptions), size=size)
+            batch["incident_description"] = descriptions[incident_idx]
+            batch["point_of_impact"] = (np.full(size, partial.point_of_impact) if partial.point_of_impact
+                                        else impacts[incident_idx])
+
+        batch["adjuster_name"] = _choice(rng, ADJUSTER_NAMES, size, partial.adjuster_name)
+        batch["status"] = _choice(rng, STATUSES, size, partial.status)
+        batch["company"], batch["claim_office"] = _company_offices(
+            rng, size, partial.company, partial.claim_office)
+
+        yield batch
+
+
+def batch_to_records(batch: Dict[str, np.ndarray]) -> Iterator[Dict]:
+    """Converts a columnar batch into JSON-ready ClaimCreate dicts (e.g. for POST /claims/bulk)."""
+    columns = {
+        name: (values.astype(str) if name == "incident_date" else values).tolist()
+        for name, values in batch.items()
+    }
+    for row in zip(*columns.values()):
+        yield dict(zip(columns.keys(), row))
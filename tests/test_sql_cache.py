@@ -0,0 +1,34 @@
+# tests/test_sql_cache.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CLAIMS_SQL_CACHE_FILE", "")  # Keep the module-level cache in memory
+
+from models import SQLQuery  # noqa: E402
+from sql_cache import SQLQueryCache, extract_slots  # noqa: E402
+
+
+@pytest.fixture
+def cache():
+    return SQLQueryCache(path=None)
+
+
+def test_template_rebinds_same_slot_kind(cache):
+    cache.store("show Approved claims", SQLQuery(sql="SELECT * FROM claims WHERE status = 'Approved';"))
+    cached = cache.lookup("show Rejected claims")
+    assert cached is not None
+    assert cached.sql == "SELECT * FROM claims WHERE status = 'Rejected';"
+
+
+def test_template_does_not_cross_slot_kinds(cache):
+    cache.store("show Approved claims", SQLQuery(sql="SELECT * FROM claims WHERE status = 'Approved';"))
+    assert cache.lookup("show Alpha Insurance claims") is None
+
+
+def test_slot_kinds_must_appear_in_the_same_order():
+    status_first, _ = extract_slots("Approved claims at Alpha Insurance")
+    company_first, _ = extract_slots("Alpha Insurance claims at Approved")
+    assert status_first != company_first
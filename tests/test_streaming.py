@@ -0,0 +1,68 @@
+# tests/test_streaming.py
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "test")  # The agents are replaced, never called
+os.environ.setdefault("CLAIMS_SQL_CACHE_FILE", "")
+os.environ.setdefault("CLAIMS_INTENT_LOG", "")
+
+from pydantic_ai import Agent  # noqa: E402
+from pydantic_ai.models.function import FunctionModel  # noqa: E402
+
+import pipeline  # noqa: E402
+
+
+class RecordingStatus(pipeline.NullStatus):
+    def __init__(self):
+        self.streamed = []
+
+    def stream(self, key: str, text: str) -> None:
+        self.streamed.append((key, text))
+
+
+def chunked_model(answer: dict, chunk_size: int = 12, delay: float = 0.02) -> FunctionModel:
+    """Streams answer as JSON text in small chunks, like a model emitting tokens."""
+    text = json.dumps(answer)
+
+    async def respond_stream(messages, info):
+        for i in range(0, len(text), chunk_size):
+            await asyncio.sleep(delay)
+            yield text[i:i + chunk_size]
+
+    return FunctionModel(stream_function=respond_stream)
+
+
+def stream(answer: dict, key: str, render):
+    agent = Agent(chunked_model(answer))
+    status = RecordingStatus()
+    timing = pipeline.TurnTiming()
+    output = asyncio.run(pipeline.stream_agent_output(agent, "prompt", status, key, render, timing))
+    time.sleep(0.01)  # The rest of the turn
+    return output, status.streamed, timing.finish()
+
+
+def test_partial_claim_is_rendered_before_the_output_completes():
+    answer = {"policy_holder_name": "Mark Rivera", "vehicle_make": "Chevrolet",
+              "incident_description": "Rear-ended yesterday at a red light", "point_of_impact": "back"}
+    output, streamed, timings = stream(answer, "extraction", pipeline.render_partial_claim)
+    assert json.loads(output) == answer
+    texts = [text for key, text in streamed if key == "extraction"]
+    assert texts and "policy_holder_name" in texts[0] and "point_of_impact" not in texts[0]
+    assert "Rear-ended yesterday at a red light" in texts[-1]
+    assert timings["first_output_ms"] < timings["total_ms"]
+
+
+def test_partial_sql_is_rendered_before_the_output_completes():
+    answer = {"sql": "SELECT * FROM claims WHERE status = 'Approved' ORDER BY incident_date DESC;",
+              "explanation": "Approved claims, newest first."}
+    output, streamed, timings = stream(answer, "sql", pipeline.render_partial_sql)
+    assert json.loads(output) == answer
+    texts = [text for key, text in streamed if key == "sql"]
+    assert texts and texts[0].startswith("📊 Drafting SQL: `S")
+    assert texts[0] != f"📊 Drafting SQL: `{answer['sql']}`"
+    assert texts[-1] == f"📊 Drafting SQL: `{answer['sql']}`"
+    assert timings["first_output_ms"] < timings["total_ms"]
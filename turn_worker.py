@@ -0,0 +1,122 @@
+# turn_worker.py
+import asyncio
+import concurrent.futures
+import itertools
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import http_clients
+from pipeline import run_turn, warm_up
+
+# Turns processed concurrently on the background loop
+TURN_CONCURRENCY = int(os.getenv("CLAIMS_TURN_CONCURRENCY", "8"))
+
+
+class TurnStatus:
+    """Thread-safe recorder of status write/stream/update calls for the UI to replay."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: List[Tuple[str, Any]] = []
+
+    def write(self, text: str) -> None:
+        with self._lock:
+            self._events.append(("write", text))
+
+    def stream(self, key: str, text: str) -> None:
+        with self._lock:
+            self._events.append(("stream", (key, text)))
+
+    def update(self, *, label: Optional[str] = None, state: Optional[str] = None,
+               expanded: Optional[bool] = None) -> None:
+        changes = {"label": label, "state": state, "expanded": expanded}
+        with self._lock:
+            self._events.append(("update", {k: v for k, v in changes.items() if v is not None}))
+
+    def events_since(self, index: int) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return self._events[index:]
+
+
+class TurnJob:
+    """A queued chat turn; `future` resolves to the assistant message dict."""
+
+    def __init__(self, job_id: int, prompt: str):
+        self.id = job_id
+        self.prompt = prompt
+        self.status = TurnStatus()
+        self.future: "concurrent.futures.Future[Dict[str, Any]]" = concurrent.futures.Future()
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.future.result(timeout)
+
+
+class TurnWorker:
+    """A persistent asyncio loop on a daemon thread that runs queued turns.
+
+    The loop, and the HTTP clients and agent state bound to it, survive
+    across Streamlit reruns; `concurrency` worker tasks keep one slow turn
+    from holding up turns from other sessions.
+    """
+
+    def __init__(self, concurrency: int = TURN_CONCURRENCY):
+        self._ids = itertools.count(1)
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._queue: Optional["asyncio.Queue[TurnJob]"] = None
+        self._workers: List["asyncio.Task[None]"] = []
+        self._thread = threading.Thread(
+            target=self._run, args=(concurrency,), name="turn-worker", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self, concurrency: int):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._workers = [self._loop.create_task(self._work()) for _ in range(concurrency)]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(await run_turn(job.prompt, job.status))
+                    except BaseException as e:  # run_turn handles its own errors; this is a backstop
+                        job.future.set_exception(e)
+                        if isinstance(e, asyncio.CancelledError):
+                            raise
+            finally:
+                self._queue.task_done()
+
+    def submit(self, prompt: str) -> TurnJob:
+        job = TurnJob(next(self._ids), prompt)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def warm_up(self) -> "concurrent.futures.Future[None]":
+        """Builds the agents on a worker thread of the loop, so the first turn need not."""
+        return asyncio.run_coroutine_threadsafe(asyncio.to_thread(warm_up), self._loop)
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def shutdown(self, timeout: float = 5.0):
+        """Cancels in-flight turns, closes the loop's HTTP clients and stops the thread."""
+        async def stop():
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            await http_clients.registry.aclose_loop()
+
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(stop(), self._loop).result(timeout)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._loop.close()